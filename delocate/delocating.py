@@ -14,6 +14,7 @@ from os.path import abspath, basename, dirname, exists, realpath, relpath
 from os.path import join as pjoin
 from pathlib import Path
 from subprocess import PIPE, Popen
+from types import MappingProxyType
 from typing import (
     Callable,
     Final,
@@ -39,6 +40,7 @@ from .libsana import (
 from .pkginfo import read_pkg_info, write_pkg_info
 from .tmpdirs import TemporaryDirectory
 from .tools import (
+    _cache_by_file_stat,
     _is_macho_file,
     _remove_absolute_rpaths,
     dir2zip,
@@ -409,7 +411,7 @@ def _dylibs_only(filename: str) -> bool:
 
 def filter_system_libs(libname: str) -> bool:
     """Return False for system libraries."""
-    return not (libname.startswith("/usr/lib") or libname.startswith("/System"))
+    return not libname.startswith(("/usr/lib", "/System"))
 
 
 def _delocate_filter_function(
@@ -587,9 +589,41 @@ def _make_install_name_ids_unique(
         validate_signature(lib)
 
 
+@_cache_by_file_stat
+def _get_macos_min_versions(
+    dylib_path: Path,
+) -> tuple[tuple[str, Version], ...]:
+    """Return CPU types and minimum macOS versions for a dylib file.
+
+    Results are cached per file, see :func:`_get_macos_min_version`.
+    """
+    if not _is_macho_file(dylib_path):
+        return ()
+    min_versions = []
+    for header in MachO(dylib_path).headers:
+        for cmd in header.commands:
+            if cmd[0].cmd == LC_BUILD_VERSION:
+                version = cmd[1].minos
+            elif cmd[0].cmd == LC_VERSION_MIN_MACOSX:
+                version = cmd[1].version
+            else:
+                continue
+            min_versions.append(
+                (
+                    CPU_TYPE_NAMES.get(header.header.cputype, "unknown"),
+                    Version(f"{version >> 16 & 0xFF}.{version >> 8 & 0xFF}"),
+                )
+            )
+            break
+    return tuple(min_versions)
+
+
 def _get_macos_min_version(dylib_path: Path) -> Iterator[tuple[str, Version]]:
     """Get the minimum macOS version from a dylib file.
 
+    The load commands of each file are only parsed again if the file has
+    changed on disk.
+
     Parameters
     ----------
     dylib_path : Path
@@ -602,28 +636,17 @@ def _get_macos_min_version(dylib_path: Path) -> Iterator[tuple[str, Version]]:
     Version
         The minimum macOS version.
     """
-    if not _is_macho_file(dylib_path):
-        return
-    for header in MachO(dylib_path).headers:
-        for cmd in header.commands:
-            if cmd[0].cmd == LC_BUILD_VERSION:
-                version = cmd[1].minos
-            elif cmd[0].cmd == LC_VERSION_MIN_MACOSX:
-                version = cmd[1].version
-            else:
-                continue
-            yield (
-                CPU_TYPE_NAMES.get(header.header.cputype, "unknown"),
-                Version(f"{version >> 16 & 0xFF}.{version >> 8 & 0xFF}"),
-            )
-            break
+    yield from _get_macos_min_versions(dylib_path)
 
 
+@functools.lru_cache(maxsize=256)
 def _get_archs_and_version_from_wheel_name(
     wheel_name: str,
-) -> dict[str, Version]:
+) -> Mapping[str, Version]:
     """Get the architecture and minimum macOS version from the wheel name.
 
+    Results are cached per wheel name, so the returned mapping is read-only.
+
     Parameters
     ----------
     wheel_name : str
@@ -631,9 +654,9 @@ def _get_archs_and_version_from_wheel_name(
 
     Returns
     -------
-    Dict[str, Version]
-        A dictionary containing the architecture and minimum macOS version
-        for each architecture in the wheel name.
+    Mapping[str, Version]
+        A read-only mapping containing the architecture and minimum macOS
+        version for each architecture in the wheel name.
     """
     platform_tag_set = parse_wheel_filename(wheel_name)[-1]
     platform_requirements = {}
@@ -651,7 +674,7 @@ def _get_archs_and_version_from_wheel_name(
             version = platform_requirements["x86_64"]
         platform_requirements = {"universal2": version}
 
-    return platform_requirements
+    return MappingProxyType(platform_requirements)
 
 
 def _get_incompatible_libs(
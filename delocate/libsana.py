@@ -40,7 +40,7 @@ class DependencyNotFound(Exception):
 
 
 def _filter_system_libs(libname: str) -> bool:
-    return not (libname.startswith("/usr/lib") or libname.startswith("/System"))
+    return not libname.startswith(("/usr/lib", "/System"))
 
 
 def get_dependencies(
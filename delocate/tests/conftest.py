@@ -1,5 +1,7 @@
 """Pytest configuration script."""
 
+from __future__ import annotations
+
 import os
 from collections.abc import Iterator
 from pathlib import Path
@@ -9,9 +11,17 @@ import pytest
 from delocate.tools import set_install_name
 from delocate.wheeltools import InWheelCtx
 
+from .test_delocating import _make_libtree_template
 from .test_wheelies import PLAT_WHEEL, STRAY_LIB_DEP, PlatWheel
 
 
+def pytest_configure(config: pytest.Config) -> None:
+    """Register custom markers."""
+    config.addinivalue_line(
+        "markers", "slow: IO-heavy tests, deselect with '-m \"not slow\"'"
+    )
+
+
 @pytest.fixture
 def plat_wheel(tmp_path: Path) -> Iterator[PlatWheel]:
     """Return a modified platform wheel for testing."""
@@ -28,3 +38,18 @@ def plat_wheel(tmp_path: Path) -> Iterator[PlatWheel]:
         )
 
     yield PlatWheel(plat_wheel_tmp, os.path.realpath(stray_lib))
+
+
+@pytest.fixture(scope="session")
+def libtree_template(tmp_path_factory: pytest.TempPathFactory) -> str:
+    """Return a directory of copied test libraries for ``_make_libtree``."""
+    template = str(tmp_path_factory.mktemp("libtree_template"))
+    _make_libtree_template(template)
+    return template
+
+
+@pytest.fixture
+def no_dyld_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Remove dyld library search paths from the environment for a test."""
+    for name in ("DYLD_LIBRARY_PATH", "DYLD_FALLBACK_LIBRARY_PATH"):
+        monkeypatch.delenv(name, raising=False)
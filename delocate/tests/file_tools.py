@@ -0,0 +1,27 @@
+"""File utilities shared by the tests."""
+
+from __future__ import annotations
+
+import os
+import shutil
+
+
+def link_or_copy(
+    src: str | os.PathLike[str], dst: str | os.PathLike[str]
+) -> None:
+    """Hardlink `src` to `dst`, copying instead if linking is not possible.
+
+    Only use this where `dst` will not be modified in place, as a hardlink
+    shares its contents with `src`.
+
+    Parameters
+    ----------
+    src : str or PathLike
+        Existing file to link or copy.
+    dst : str or PathLike
+        New file name.
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
@@ -1,10 +1,8 @@
-import os
-
 import pytest
 
 # ruff: noqa
 # I recommend removing this module entirely. -@HexDecimal
-# Assert functions confuse pytest, in_tmp_path is not used.
+# Assert functions confuse pytest.
 
 
 def assert_true(condition):
@@ -30,11 +28,3 @@ def assert_equal(first, second):
 def assert_not_equal(first, second):
     __tracebackhide__ = True
     assert first != second
-
-
-@pytest.fixture
-def in_tmp_path(tmp_path):
-    cwd = os.getcwd()
-    os.chdir(tmp_path)
-    yield tmp_path
-    os.chdir(cwd)
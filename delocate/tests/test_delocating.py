@@ -1,5 +1,7 @@
 """Tests for relocating libraries."""
 
+from __future__ import annotations
+
 import os
 import shutil
 import subprocess
@@ -8,14 +10,18 @@ from collections import namedtuple
 from collections.abc import Iterable
 from os.path import basename, dirname, realpath, relpath, splitext
 from os.path import join as pjoin
+from pathlib import Path
 from typing import Any, Callable
 
 import pytest
+from macholib.MachO import MachO  # type: ignore[import-untyped]
 from packaging.utils import InvalidWheelFilename
 from packaging.version import Version
 
+from .. import delocating
 from ..delocating import (
     _get_archs_and_version_from_wheel_name,
+    _get_macos_min_version,
     bads_report,
     check_archs,
     copy_recurse,
@@ -30,9 +36,7 @@ from ..libsana import (
     tree_libs_from_directory,
 )
 from ..tmpdirs import InTemporaryDirectory
-from ..tools import get_install_names, set_install_name
-from .env_tools import TempDirWithoutEnvVars
-from .pytest_tools import assert_equal, assert_raises
+from ..tools import get_install_names, set_install_name, set_install_names
 from .test_install_names import EXT_LIBS, LIBA, LIBB, LIBC, TEST_LIB, _copy_libs
 from .test_tools import (
     ARCH_32,
@@ -50,21 +54,57 @@ LibtreeLibs = namedtuple(
 )
 
 
-def _make_libtree(out_path: str) -> LibtreeLibs:
-    liba, libb, libc, test_lib = _copy_libs(
-        [LIBA, LIBB, LIBC, TEST_LIB], out_path
-    )
-    sub_path = pjoin(out_path, "subsub")
-    slibc, stest_lib = _copy_libs([libc, test_lib], sub_path)
+def _run_executables(*executables: str, fail: bool = False) -> None:
+    """Run each of `executables` in turn from a single shell process.
+
+    Checks that every executable exits successfully, or, if `fail` is True,
+    that every executable fails.
+    """
+    if fail:
+        script = 'for exe; do "$exe" && exit 1; done; exit 0'
+    else:
+        script = 'for exe; do "$exe" || exit 1; done'
+    subprocess.run(["/bin/sh", "-c", script, "sh", *executables], check=True)
+
+
+def _make_libtree_template(out_path: str) -> None:
+    """Copy the test libraries into `out_path`, before any install name fixes.
+
+    Checks that the copied executables fail to run, because of their relative
+    library paths.
+    """
+    _, _, libc, test_lib = _copy_libs([LIBA, LIBB, LIBC, TEST_LIB], out_path)
+    slibc, stest_lib = _copy_libs([libc, test_lib], pjoin(out_path, "subsub"))
     # Set execute permissions
     for exe in (test_lib, stest_lib):
         os.chmod(exe, 0o744)
     # Check test-lib doesn't work because of relative library paths
-    with pytest.raises(subprocess.CalledProcessError):
-        subprocess.run([test_lib], check=True)
-    with pytest.raises(subprocess.CalledProcessError):
-        subprocess.run([stest_lib], check=True)
-    # Fixup the relative path library names by setting absolute paths
+    _run_executables(test_lib, stest_lib, fail=True)
+
+
+def _make_libtree(out_path: str, template: str | None = None) -> LibtreeLibs:
+    """Make a tree of test libraries in `out_path` with absolute install names.
+
+    If given, `template` is a directory made by `_make_libtree_template`,
+    which is copied into `out_path` rather than copying and checking the
+    libraries again.
+    """
+    if template is None:
+        _make_libtree_template(out_path)
+    else:
+        shutil.copytree(template, out_path, dirs_exist_ok=True)
+    sub_path = pjoin(out_path, "subsub")
+    liba, libb, libc, test_lib = (
+        pjoin(out_path, basename(fname))
+        for fname in (LIBA, LIBB, LIBC, TEST_LIB)
+    )
+    slibc, stest_lib = (
+        pjoin(sub_path, "libc.dylib"),
+        pjoin(sub_path, "test-lib"),
+    )
+    # Fixup the relative path library names by setting absolute paths, one
+    # install_name_tool call per library
+    changes: dict[str, list[tuple[str, str]]] = {}
     for fname, using, path in (
         (libb, "liba.dylib", out_path),
         (libc, "liba.dylib", out_path),
@@ -74,10 +114,11 @@ def _make_libtree(out_path: str) -> LibtreeLibs:
         (slibc, "libb.dylib", out_path),
         (stest_lib, "libc.dylib", sub_path),
     ):
-        set_install_name(fname, using, pjoin(path, using))
+        changes.setdefault(fname, []).append((using, pjoin(path, using)))
+    for fname, fname_changes in changes.items():
+        set_install_names(fname, fname_changes)
     # Check scripts now execute correctly
-    subprocess.run([test_lib], check=True)
-    subprocess.run([stest_lib], check=True)
+    _run_executables(test_lib, stest_lib)
     return LibtreeLibs(liba, libb, libc, test_lib, slibc, stest_lib)
 
 
@@ -93,135 +134,139 @@ def without_system_libs(obj):
     return out
 
 
+@pytest.mark.slow
 @pytest.mark.xfail(sys.platform != "darwin", reason="Runs macOS executable.")
 @pytest.mark.filterwarnings("ignore:tree_libs:DeprecationWarning")
+@pytest.mark.usefixtures("no_dyld_env")
 @pytest.mark.parametrize(
     "tree_libs_func", [tree_libs, tree_libs_from_directory]
 )
 def test_delocate_tree_libs(
     tree_libs_func: Callable[[str], dict[str, dict[str, str]]],
+    libtree_template: str,
+    tmp_path: Path,
 ) -> None:
     # Test routine to copy library dependencies into a local directory
-    with InTemporaryDirectory() as tmpdir:
-        # Copy libs into a temporary directory
-        subtree = pjoin(tmpdir, "subtree")
-        all_local_libs = _make_libtree(subtree)
-        liba, libb, libc, test_lib, slibc, stest_lib = all_local_libs
-        copy_dir = "dynlibs"
-        os.makedirs(copy_dir)
-        # First check that missing out-of-system tree library causes error.
-        sys_lib = EXT_LIBS[0]
-        lib_dict = without_system_libs(tree_libs_func(subtree))
-        lib_dict.update({"/unlikely/libname.dylib": {}})
-        with pytest.raises(
-            DelocationError, match=r".*/unlikely/libname.dylib.*does not exist"
-        ):
-            delocate_tree_libs(lib_dict, copy_dir, subtree)
-
-        lib_dict = without_system_libs(tree_libs_func(subtree))
-        copied = delocate_tree_libs(lib_dict, copy_dir, subtree)
-        # There are no out-of-tree libraries, nothing gets copied
-        assert len(copied) == 0
-        # Make an out-of-tree library to test against.
-        os.makedirs("out_of_tree")
-        fake_lib = realpath(pjoin("out_of_tree", "libfake.dylib"))
-        shutil.copyfile(liba, fake_lib)
-        set_install_name(liba, sys_lib, fake_lib)
-        lib_dict = without_system_libs(tree_libs_func(subtree))
-        copied = delocate_tree_libs(lib_dict, copy_dir, subtree)
-        # Out-of-tree library copied.
-        assert copied == {fake_lib: {realpath(liba): fake_lib}}
-        assert os.listdir(copy_dir) == [basename(fake_lib)]
-        # Library using the copied library now has an
-        # install name starting with @loader_path, then
-        # pointing to the copied library directory
-        pathto_copies = relpath(realpath(copy_dir), dirname(realpath(liba)))
-        lib_inames = without_system_libs(get_install_names(liba))
-        new_link = f"@loader_path/{pathto_copies}/{basename(fake_lib)}"
-        assert [new_link] <= lib_inames
-        # Libraries now have a relative loader_path to their corresponding
-        # in-tree libraries
-        for requiring, using, rel_path in (
-            (libb, "liba.dylib", ""),
-            (libc, "liba.dylib", ""),
-            (libc, "libb.dylib", ""),
-            (test_lib, "libc.dylib", ""),
-            (slibc, "liba.dylib", "../"),
-            (slibc, "libb.dylib", "../"),
-            (stest_lib, "libc.dylib", ""),
-        ):
-            loader_path = "@loader_path/" + rel_path + using
-            not_sys_req = without_system_libs(get_install_names(requiring))
-            assert loader_path in not_sys_req
-        # Another copy to delocate, now without faked out-of-tree dependency.
-        subtree = pjoin(tmpdir, "subtree1")
-        out_libs = _make_libtree(subtree)
-        lib_dict = without_system_libs(tree_libs_func(subtree))
-        copied = delocate_tree_libs(lib_dict, copy_dir, subtree)
-        # Now no out-of-tree libraries, nothing copied.
-        assert copied == {}
-        # Check test libs still work
-        subprocess.run([out_libs.test_lib], check=True)
-        subprocess.run([out_libs.stest_lib], check=True)
-        # Check case where all local libraries are out of tree
-        subtree2 = pjoin(tmpdir, "subtree2")
-        liba, libb, libc, test_lib, slibc, stest_lib = _make_libtree(subtree2)
-        copy_dir2 = "dynlibs2"
-        os.makedirs(copy_dir2)
-        # Trying to delocate where all local libraries appear to be
-        # out-of-tree will raise an error because of duplicate library names
-        # (libc and slibc both named <something>/libc.dylib)
-        lib_dict2 = without_system_libs(tree_libs_func(subtree2))
-        with pytest.raises(
-            DelocationError,
-            match=r"Already planning to copy library with same basename as: "
-            r"libc.dylib",
-        ):
-            delocate_tree_libs(lib_dict2, copy_dir2, "/fictional")
-        # Rename a library to make this work
-        new_slibc = pjoin(dirname(slibc), "libc2.dylib")
-        os.rename(slibc, new_slibc)
-        # Tell test-lib about this
-        set_install_name(stest_lib, slibc, new_slibc)
-        slibc = new_slibc
-        # Confirm new test-lib still works
-        subprocess.run([test_lib], check=True)
-        subprocess.run([stest_lib], check=True)
-        # Delocation now works
-        lib_dict2 = without_system_libs(tree_libs_func(subtree2))
-        copied2 = delocate_tree_libs(lib_dict2, copy_dir2, "/fictional")
-        local_libs = [liba, libb, libc, slibc, test_lib, stest_lib]
-        rp_liba, rp_libb, rp_libc, rp_slibc, rp_test_lib, rp_stest_lib = (
-            realpath(L) for L in local_libs
-        )
-        exp_dict = {
-            rp_libc: {rp_test_lib: libc},
-            rp_slibc: {rp_stest_lib: slibc},
-            rp_libb: {rp_slibc: libb, rp_libc: libb},
-            rp_liba: {rp_slibc: liba, rp_libc: liba, rp_libb: liba},
-        }
-        assert copied2 == exp_dict
-        ext_local_libs = {liba, libb, libc, slibc}
-        assert set(os.listdir(copy_dir2)) == {
-            basename(lib) for lib in ext_local_libs
-        }
-        # Libraries using the copied libraries now have an install name starting
-        # with @loader_path, then pointing to the copied library directory
-        for lib in (liba, libb, libc, test_lib, slibc, stest_lib):
-            pathto_copies = relpath(realpath(copy_dir2), dirname(realpath(lib)))
-            lib_inames = get_install_names(lib)
-            new_links = [
-                f"@loader_path/{pathto_copies}/{basename(elib)}"
-                for elib in copied
-            ]
-            assert set(new_links) <= set(lib_inames)
+    tmpdir = str(tmp_path)
+    # Copy libs into a temporary directory
+    subtree = pjoin(tmpdir, "subtree")
+    all_local_libs = _make_libtree(subtree, libtree_template)
+    liba, libb, libc, test_lib, slibc, stest_lib = all_local_libs
+    copy_dir = pjoin(tmpdir, "dynlibs")
+    os.makedirs(copy_dir)
+    # First check that missing out-of-system tree library causes error.
+    sys_lib = EXT_LIBS[0]
+    # The tree is unchanged until the install name change below, so analyze
+    # it once for the first two delocations.
+    base_lib_dict = without_system_libs(tree_libs_func(subtree))
+    lib_dict = {**base_lib_dict, "/unlikely/libname.dylib": {}}
+    with pytest.raises(
+        DelocationError, match=r".*/unlikely/libname.dylib.*does not exist"
+    ):
+        delocate_tree_libs(lib_dict, copy_dir, subtree)
+
+    copied = delocate_tree_libs(base_lib_dict, copy_dir, subtree)
+    # There are no out-of-tree libraries, nothing gets copied
+    assert len(copied) == 0
+    # Make an out-of-tree library to test against.
+    os.makedirs(pjoin(tmpdir, "out_of_tree"))
+    fake_lib = realpath(pjoin(tmpdir, "out_of_tree", "libfake.dylib"))
+    shutil.copyfile(liba, fake_lib)
+    set_install_name(liba, sys_lib, fake_lib)
+    lib_dict = without_system_libs(tree_libs_func(subtree))
+    copied = delocate_tree_libs(lib_dict, copy_dir, subtree)
+    # Out-of-tree library copied.
+    assert copied == {fake_lib: {realpath(liba): fake_lib}}
+    assert os.listdir(copy_dir) == [basename(fake_lib)]
+    # Library using the copied library now has an
+    # install name starting with @loader_path, then
+    # pointing to the copied library directory
+    pathto_copies = relpath(realpath(copy_dir), dirname(realpath(liba)))
+    lib_inames = without_system_libs(get_install_names(liba))
+    new_link = f"@loader_path/{pathto_copies}/{basename(fake_lib)}"
+    assert [new_link] <= lib_inames
+    # Libraries now have a relative loader_path to their corresponding
+    # in-tree libraries
+    for requiring, using, rel_path in (
+        (libb, "liba.dylib", ""),
+        (libc, "liba.dylib", ""),
+        (libc, "libb.dylib", ""),
+        (test_lib, "libc.dylib", ""),
+        (slibc, "liba.dylib", "../"),
+        (slibc, "libb.dylib", "../"),
+        (stest_lib, "libc.dylib", ""),
+    ):
+        loader_path = "@loader_path/" + rel_path + using
+        not_sys_req = without_system_libs(get_install_names(requiring))
+        assert loader_path in not_sys_req
+    # Another copy to delocate, now without faked out-of-tree dependency.
+    subtree = pjoin(tmpdir, "subtree1")
+    out_libs = _make_libtree(subtree, libtree_template)
+    lib_dict = without_system_libs(tree_libs_func(subtree))
+    copied = delocate_tree_libs(lib_dict, copy_dir, subtree)
+    # Now no out-of-tree libraries, nothing copied.
+    assert copied == {}
+    # Check test libs still work
+    _run_executables(out_libs.test_lib, out_libs.stest_lib)
+    # Check case where all local libraries are out of tree
+    subtree2 = pjoin(tmpdir, "subtree2")
+    liba, libb, libc, test_lib, slibc, stest_lib = _make_libtree(
+        subtree2, libtree_template
+    )
+    copy_dir2 = pjoin(tmpdir, "dynlibs2")
+    os.makedirs(copy_dir2)
+    # Trying to delocate where all local libraries appear to be
+    # out-of-tree will raise an error because of duplicate library names
+    # (libc and slibc both named <something>/libc.dylib)
+    lib_dict2 = without_system_libs(tree_libs_func(subtree2))
+    with pytest.raises(
+        DelocationError,
+        match=r"Already planning to copy library with same basename as: "
+        r"libc.dylib",
+    ):
+        delocate_tree_libs(lib_dict2, copy_dir2, "/fictional")
+    # Rename a library to make this work
+    new_slibc = pjoin(dirname(slibc), "libc2.dylib")
+    os.rename(slibc, new_slibc)
+    # Tell test-lib about this
+    set_install_name(stest_lib, slibc, new_slibc)
+    slibc = new_slibc
+    # Confirm new test-lib still works
+    _run_executables(test_lib, stest_lib)
+    # Delocation now works
+    lib_dict2 = without_system_libs(tree_libs_func(subtree2))
+    copied2 = delocate_tree_libs(lib_dict2, copy_dir2, "/fictional")
+    local_libs = [liba, libb, libc, slibc, test_lib, stest_lib]
+    # Resolve each library path once
+    rp = {lib: realpath(lib) for lib in local_libs}
+    exp_dict = {
+        rp[libc]: {rp[test_lib]: libc},
+        rp[slibc]: {rp[stest_lib]: slibc},
+        rp[libb]: {rp[slibc]: libb, rp[libc]: libb},
+        rp[liba]: {rp[slibc]: liba, rp[libc]: liba, rp[libb]: liba},
+    }
+    assert copied2 == exp_dict
+    ext_local_libs = {liba, libb, libc, slibc}
+    assert set(os.listdir(copy_dir2)) == {
+        basename(lib) for lib in ext_local_libs
+    }
+    # Libraries using the copied libraries now have an install name starting
+    # with @loader_path, then pointing to the copied library directory
+    rp_copy_dir2 = realpath(copy_dir2)
+    for lib in local_libs:
+        pathto_copies = relpath(rp_copy_dir2, dirname(rp[lib]))
+        lib_inames = get_install_names(lib)
+        new_links = [
+            f"@loader_path/{pathto_copies}/{basename(elib)}" for elib in copied
+        ]
+        assert set(new_links) <= set(lib_inames)
 
 
 def _copy_fixpath(files: Iterable[str], directory: str) -> list[str]:
     new_fnames = []
     for fname in files:
-        shutil.copy2(fname, directory)
         new_fname = pjoin(directory, basename(fname))
+        shutil.copyfile(fname, new_fname)
         for name in get_install_names(fname):
             if name.startswith("lib"):
                 set_install_name(new_fname, name, pjoin(directory, name))
@@ -231,10 +276,11 @@ def _copy_fixpath(files: Iterable[str], directory: str) -> list[str]:
 
 def _copy_to(fname: str, directory: str, new_base: str) -> str:
     new_name = pjoin(directory, new_base)
-    shutil.copy2(fname, new_name)
+    shutil.copyfile(fname, new_name)
     return new_name
 
 
+@pytest.mark.slow
 @pytest.mark.xfail(sys.platform != "darwin", reason="otool")
 @pytest.mark.filterwarnings("ignore:tree_libs:DeprecationWarning")
 @pytest.mark.filterwarnings("ignore:copy_recurse:DeprecationWarning")
@@ -367,9 +413,9 @@ def test_copy_recurse_overwrite() -> None:
 
         os.makedirs("subtree")
         # libb depends on liba
-        shutil.copy2(libb, "subtree")
+        shutil.copyfile(libb, pjoin("subtree", "libb.dylib"))
         # If liba is already present, barf
-        shutil.copy2(liba, "subtree")
+        shutil.copyfile(liba, pjoin("subtree", "liba.dylib"))
         with pytest.raises(
             DelocationError, match=r".*liba.dylib .*already exists"
         ):
@@ -379,78 +425,94 @@ def test_copy_recurse_overwrite() -> None:
         copy_recurse("subtree", filt_func)
 
 
+@pytest.mark.usefixtures("no_dyld_env")
+@pytest.mark.slow
 @pytest.mark.xfail(sys.platform != "darwin", reason="Runs macOS executable.")
-def test_delocate_path() -> None:
+def test_delocate_path(libtree_template: str, tmp_path: Path) -> None:
     # Test high-level path delocator script
-    with InTemporaryDirectory():
-        # Make a tree; use realpath for OSX /private/var - /var
-        _, _, _, test_lib, slibc, stest_lib = _make_libtree(realpath("subtree"))
-        # Check it fixes up correctly
-        assert delocate_path("subtree", "deplibs") == {}
-        assert len(os.listdir("deplibs")) == 0
-        subprocess.run([test_lib], check=True)
-        subprocess.run([stest_lib], check=True)
-        # Make a fake external library to link to
-        os.makedirs("fakelibs")
-        fake_lib = realpath(_copy_to(LIBA, "fakelibs", "libfake.dylib"))
-        _, _, _, test_lib, slibc, stest_lib = _make_libtree(
-            realpath("subtree2")
-        )
-        set_install_name(slibc, EXT_LIBS[0], fake_lib)
-        # shortcut
-        _rp = realpath
-        # Check fake libary gets copied and delocated
-        slc_rel = pjoin("subtree2", "subsub", "libc.dylib")
-        assert delocate_path("subtree2", "deplibs2") == {
-            _rp(fake_lib): {_rp(slc_rel): fake_lib}
-        }
-        assert os.listdir("deplibs2") == ["libfake.dylib"]
-        assert "@loader_path/../../deplibs2/libfake.dylib" in get_install_names(
-            slibc
-        )
-        # Unless we set the filter otherwise
-        _, _, _, test_lib, slibc, stest_lib = _make_libtree(
-            realpath("subtree3")
-        )
-        set_install_name(slibc, EXT_LIBS[0], fake_lib)
-
-        def filt(libname: str) -> bool:
-            return not (libname.startswith("/usr") or "libfake" in libname)
-
-        assert delocate_path("subtree3", "deplibs3", None, filt) == {}
-        assert len(os.listdir("deplibs3")) == 0
-        # Test tree names filtering works
-        _, _, _, test_lib, slibc, stest_lib = _make_libtree(
-            realpath("subtree4")
-        )
-        set_install_name(slibc, EXT_LIBS[0], fake_lib)
-
-        def lib_filt(filename: str) -> bool:
-            return not filename.endswith("subsub/libc.dylib")
-
-        assert delocate_path("subtree4", "deplibs4", lib_filt) == {}
-        assert len(os.listdir("deplibs4")) == 0
-        # Check can use already existing directory
-        os.makedirs("deplibs5")
-        _, _, _, test_lib, slibc, stest_lib = _make_libtree(
-            realpath("subtree5")
-        )
-        assert delocate_path("subtree5", "deplibs5") == {}
-        assert len(os.listdir("deplibs5")) == 0
-        # Check invalid string
-        with pytest.raises(TypeError):
-            delocate_path("subtree5", "deplibs5", lib_filt_func="invalid-str")
+    # Make a tree; use realpath for OSX /private/var - /var
+    tmpdir = realpath(tmp_path)
+    subtree = pjoin(tmpdir, "subtree")
+    deplibs = pjoin(tmpdir, "deplibs")
+    _, _, _, test_lib, slibc, stest_lib = _make_libtree(
+        subtree, libtree_template
+    )
+    # Check it fixes up correctly
+    assert delocate_path(subtree, deplibs) == {}
+    assert len(os.listdir(deplibs)) == 0
+    _run_executables(test_lib, stest_lib)
+    # Make a fake external library to link to
+    fakelibs = pjoin(tmpdir, "fakelibs")
+    os.makedirs(fakelibs)
+    fake_lib = realpath(_copy_to(LIBA, fakelibs, "libfake.dylib"))
+    subtree2 = pjoin(tmpdir, "subtree2")
+    deplibs2 = pjoin(tmpdir, "deplibs2")
+    _, _, _, test_lib, slibc, stest_lib = _make_libtree(
+        subtree2, libtree_template
+    )
+    set_install_name(slibc, EXT_LIBS[0], fake_lib)
+    # shortcut
+    _rp = realpath
+    # Check fake libary gets copied and delocated
+    slc_rel = pjoin(subtree2, "subsub", "libc.dylib")
+    assert delocate_path(subtree2, deplibs2) == {
+        _rp(fake_lib): {_rp(slc_rel): fake_lib}
+    }
+    assert os.listdir(deplibs2) == ["libfake.dylib"]
+    assert "@loader_path/../../deplibs2/libfake.dylib" in get_install_names(
+        slibc
+    )
+    # Unless we set the filter otherwise
+    subtree3 = pjoin(tmpdir, "subtree3")
+    deplibs3 = pjoin(tmpdir, "deplibs3")
+    _, _, _, test_lib, slibc, stest_lib = _make_libtree(
+        subtree3, libtree_template
+    )
+    set_install_name(slibc, EXT_LIBS[0], fake_lib)
+
+    def filt(libname: str) -> bool:
+        return not (libname.startswith("/usr") or "libfake" in libname)
+
+    assert delocate_path(subtree3, deplibs3, None, filt) == {}
+    assert len(os.listdir(deplibs3)) == 0
+    # Test tree names filtering works
+    subtree4 = pjoin(tmpdir, "subtree4")
+    deplibs4 = pjoin(tmpdir, "deplibs4")
+    _, _, _, test_lib, slibc, stest_lib = _make_libtree(
+        subtree4, libtree_template
+    )
+    set_install_name(slibc, EXT_LIBS[0], fake_lib)
+
+    def lib_filt(filename: str) -> bool:
+        return not filename.endswith("subsub/libc.dylib")
+
+    assert delocate_path(subtree4, deplibs4, lib_filt) == {}
+    assert len(os.listdir(deplibs4)) == 0
+    # Check can use already existing directory
+    subtree5 = pjoin(tmpdir, "subtree5")
+    deplibs5 = pjoin(tmpdir, "deplibs5")
+    os.makedirs(deplibs5)
+    _, _, _, test_lib, slibc, stest_lib = _make_libtree(
+        subtree5, libtree_template
+    )
+    assert delocate_path(subtree5, deplibs5) == {}
+    assert len(os.listdir(deplibs5)) == 0
+    # Check invalid string
+    with pytest.raises(TypeError):
+        delocate_path(subtree5, deplibs5, lib_filt_func="invalid-str")
 
 
-def _make_bare_depends() -> tuple[str, str]:
+def _make_bare_depends(root: str = "") -> tuple[str, str]:
     # Copy:
     # * liba.dylib to 'libs' dir, which is a dependency of libb.dylib
     # * libb.dylib to 'subtree' dir, as 'libb' (no extension).
     #
+    # Both directories are made in `root`, defaulting to the current directory.
+    #
     # This is for testing delocation when the depending file does not have a
     # dynamic library file extension.
-    (libb,) = _copy_libs([LIBB], "subtree")
-    (liba,) = _copy_libs([LIBA], "libs")
+    (libb,) = _copy_libs([LIBB], pjoin(root, "subtree"))
+    (liba,) = _copy_libs([LIBA], pjoin(root, "libs"))
     bare_b, _ = splitext(libb)
     os.rename(libb, bare_b)
     # use realpath for OSX /private/var - /var
@@ -458,40 +520,49 @@ def _make_bare_depends() -> tuple[str, str]:
     return liba, bare_b
 
 
+@pytest.mark.usefixtures("no_dyld_env")
 @pytest.mark.xfail(sys.platform != "darwin", reason="otool")
-def test_delocate_path_dylibs() -> None:
+def test_delocate_path_dylibs(tmp_path: Path) -> None:
     # Test options for delocating everything, or just dynamic libraries
     _rp = realpath  # shortcut
-    with InTemporaryDirectory():
-        # With 'dylibs-only' - does not inspect non-dylib files
-        liba, bare_b = _make_bare_depends()
-        assert_equal(
-            delocate_path("subtree", "deplibs", lib_filt_func="dylibs-only"),
-            {},
-        )
-        assert_equal(len(os.listdir("deplibs")), 0)
-        # None - does inspect non-dylib files
-        assert_equal(
-            delocate_path("subtree", "deplibs", None),
-            {_rp(pjoin("libs", "liba.dylib")): {_rp(bare_b): _rp(liba)}},
-        )
-        assert_equal(os.listdir("deplibs"), ["liba.dylib"])
-    with InTemporaryDirectory():
-        # Callable, dylibs only, does not inspect
-        liba, bare_b = _make_bare_depends()
-
-        def func(fn: str) -> bool:
-            return fn.endswith(".dylib")
-
-        assert_equal(delocate_path("subtree", "deplibs", func), {})
+    # With 'dylibs-only' - does not inspect non-dylib files
+    tmpdir = str(tmp_path / "dylibs_only")
+    subtree = pjoin(tmpdir, "subtree")
+    deplibs = pjoin(tmpdir, "deplibs")
+    liba, bare_b = _make_bare_depends(tmpdir)
+    assert delocate_path(subtree, deplibs, lib_filt_func="dylibs-only") == {}
+    assert len(os.listdir(deplibs)) == 0
+    # None - does inspect non-dylib files
+    assert delocate_path(subtree, deplibs, None) == {
+        _rp(pjoin(tmpdir, "libs", "liba.dylib")): {_rp(bare_b): _rp(liba)}
+    }
+    assert os.listdir(deplibs) == ["liba.dylib"]
+    # Callable, dylibs only, does not inspect
+    tmpdir = str(tmp_path / "callable")
+    subtree = pjoin(tmpdir, "subtree")
+    deplibs = pjoin(tmpdir, "deplibs")
+    liba, bare_b = _make_bare_depends(tmpdir)
+
+    def func(fn: str) -> bool:
+        return fn.endswith(".dylib")
+
+    assert delocate_path(subtree, deplibs, func) == {}
+    # None again - does inspect non-dylib files
+    assert delocate_path(subtree, deplibs, None) == {
+        _rp(pjoin(tmpdir, "libs", "liba.dylib")): {_rp(bare_b): _rp(liba)}
+    }
+    # Callable, selecting the bare library, does inspect it
+    tmpdir = str(tmp_path / "libb_callable")
+    subtree = pjoin(tmpdir, "subtree")
+    deplibs = pjoin(tmpdir, "deplibs")
+    liba, bare_b = _make_bare_depends(tmpdir)
 
-        def func(fn: str) -> bool:
-            return fn.endswith("libb")
+    def libb_func(fn: str) -> bool:
+        return fn.endswith("libb")
 
-        assert_equal(
-            delocate_path("subtree", "deplibs", None),
-            {_rp(pjoin("libs", "liba.dylib")): {_rp(bare_b): _rp(liba)}},
-        )
+    assert delocate_path(subtree, deplibs, libb_func) == {
+        _rp(pjoin(tmpdir, "libs", "liba.dylib")): {_rp(bare_b): _rp(liba)}
+    }
 
 
 @pytest.mark.xfail(sys.platform != "darwin", reason="lipo")
@@ -499,95 +570,96 @@ def test_check_archs() -> None:
     # Test utility to check architectures in copied_libs dict
     # No libs always OK
     s0: set[Any] = set()
-    assert_equal(check_archs({}), s0)
+    assert check_archs({}) == s0
     # One lib to itself OK
     lib_M1_M1 = {LIBM1: {LIBM1: "install_name"}}
     lib_64_64 = {LIB64: {LIB64: "install_name"}}
-    assert_equal(check_archs(lib_M1_M1), s0)
-    assert_equal(check_archs(lib_64_64), s0)
+    assert check_archs(lib_M1_M1) == s0
+    assert check_archs(lib_64_64) == s0
     # OK matching to another static lib of same arch
-    assert_equal(check_archs({LIB64A: {LIB64: "install_name"}}), s0)
+    assert check_archs({LIB64A: {LIB64: "install_name"}}) == s0
     # Or two libs
     two_libs = {
         LIB64A: {LIB64: "install_name"},
         LIBM1: {LIBM1: "install_name"},
     }
-    assert_equal(check_archs(two_libs), s0)
+    assert check_archs(two_libs) == s0
     # Same as empty sequence required_args argument
-    assert_equal(check_archs(lib_M1_M1, ()), s0)
-    assert_equal(check_archs(lib_64_64, ()), s0)
-    assert_equal(check_archs(two_libs, ()), s0)
-    assert_equal(check_archs(two_libs, []), s0)
-    assert_equal(check_archs(two_libs, set()), s0)
-    # bads if we require more archs than present
-    for in_libs, exp_arch, missing in (
-        (lib_M1_M1, ARCH_64, ARCH_64),
-        (lib_M1_M1, ARCH_BOTH, ARCH_64),
-        (lib_M1_M1, "x86_64", ARCH_64),
-        (lib_M1_M1, "universal2", ARCH_64),
-        (lib_64_64, ARCH_M1, ARCH_M1),
-        (lib_64_64, ARCH_BOTH, ARCH_M1),
-        (lib_64_64, "arm64", ARCH_M1),
-        (lib_64_64, "intel", ARCH_32),
-        (lib_64_64, "universal2", ARCH_M1),
-    ):
-        ded, value = list(in_libs.items())[0]
-        ding, _ = list(value.items())[0]
-        arch_check = check_archs(in_libs, exp_arch)
-        assert_equal(arch_check, {(ding, missing)})
+    assert check_archs(lib_M1_M1, ()) == s0
+    assert check_archs(lib_64_64, ()) == s0
+    assert check_archs(two_libs, ()) == s0
+    assert check_archs(two_libs, []) == s0
+    assert check_archs(two_libs, set()) == s0
     # Two libs
-    assert_equal(check_archs(two_libs, ARCH_M1), {(LIB64, ARCH_M1)})
-    assert_equal(check_archs(two_libs, ARCH_64), {(LIBM1, ARCH_64)})
-    assert_equal(
-        check_archs(two_libs, ARCH_BOTH), {(LIB64, ARCH_M1), (LIBM1, ARCH_64)}
-    )
+    assert check_archs(two_libs, ARCH_M1) == {(LIB64, ARCH_M1)}
+    assert check_archs(two_libs, ARCH_64) == {(LIBM1, ARCH_64)}
+    assert check_archs(two_libs, ARCH_BOTH) == {
+        (LIB64, ARCH_M1),
+        (LIBM1, ARCH_64),
+    }
     # Libs must match architecture with second arg of None
-    assert_equal(
-        check_archs({LIB64: {LIBM1: "install_name"}}),
-        {(LIB64, LIBM1, ARCH_M1)},
-    )
-    assert_equal(
-        check_archs(
-            {
-                LIB64A: {LIB64: "install_name"},
-                LIBM1: {LIBM1: "install_name"},
-                LIB64: {LIBM1: "install_name"},
-            }
-        ),
-        {(LIB64, LIBM1, ARCH_M1)},
-    )
+    assert check_archs({LIB64: {LIBM1: "install_name"}}) == {
+        (LIB64, LIBM1, ARCH_M1)
+    }
+    assert check_archs(
+        {
+            LIB64A: {LIB64: "install_name"},
+            LIBM1: {LIBM1: "install_name"},
+            LIB64: {LIBM1: "install_name"},
+        }
+    ) == {(LIB64, LIBM1, ARCH_M1)}
     # For single archs depending, dual archs in depended is OK
     assert check_archs({LIBBOTH: {LIB64A: "install_name"}}) == s0
     # For dual archs in depending, both must be present
-    assert_equal(check_archs({LIBBOTH: {LIBBOTH: "install_name"}}), s0)
-    assert_equal(
-        check_archs({LIB64A: {LIBBOTH: "install_name"}}),
-        {(LIB64A, LIBBOTH, ARCH_M1)},
-    )
+    assert check_archs({LIBBOTH: {LIBBOTH: "install_name"}}) == s0
+    assert check_archs({LIB64A: {LIBBOTH: "install_name"}}) == {
+        (LIB64A, LIBBOTH, ARCH_M1)
+    }
     # More than one bad
     in_dict = {
         LIB64A: {LIBBOTH: "install_name"},
         LIB64: {LIBM1: "install_name"},
     }
     exp_res = {(LIB64A, LIBBOTH, ARCH_M1), (LIB64, LIBM1, ARCH_M1)}
-    assert_equal(check_archs(in_dict), exp_res)
+    assert check_archs(in_dict) == exp_res
     # Check stop_fast flag; can't predict return, but there should only be one
     stopped = check_archs(in_dict, (), True)
-    assert_equal(len(stopped), 1)
+    assert len(stopped) == 1
     # More than one bad in dependings
-    assert_equal(
-        check_archs(
-            {
-                LIB64A: {LIBBOTH: "install_name", LIBM1: "install_name"},
-                LIB64: {LIBM1: "install_name"},
-            }
-        ),
+    assert check_archs(
         {
-            (LIB64A, LIBBOTH, ARCH_M1),
-            (LIB64A, LIBM1, ARCH_M1),
-            (LIB64, LIBM1, ARCH_M1),
-        },
-    )
+            LIB64A: {LIBBOTH: "install_name", LIBM1: "install_name"},
+            LIB64: {LIBM1: "install_name"},
+        }
+    ) == {
+        (LIB64A, LIBBOTH, ARCH_M1),
+        (LIB64A, LIBM1, ARCH_M1),
+        (LIB64, LIBM1, ARCH_M1),
+    }
+
+
+@pytest.mark.xfail(sys.platform != "darwin", reason="lipo")
+@pytest.mark.parametrize(
+    "lib, exp_arch, missing",
+    [
+        (LIBM1, ARCH_64, ARCH_64),
+        (LIBM1, ARCH_BOTH, ARCH_64),
+        (LIBM1, "x86_64", ARCH_64),
+        (LIBM1, "universal2", ARCH_64),
+        (LIB64, ARCH_M1, ARCH_M1),
+        (LIB64, ARCH_BOTH, ARCH_M1),
+        (LIB64, "arm64", ARCH_M1),
+        (LIB64, "intel", ARCH_32),
+        (LIB64, "universal2", ARCH_M1),
+    ],
+)
+def test_check_archs_missing_arch(
+    lib: str, exp_arch: str | frozenset[str], missing: frozenset[str]
+) -> None:
+    # bads if we require more archs than present in a lib depending on itself
+    assert check_archs({lib: {lib: "install_name"}}, exp_arch) == {
+        (lib, missing)
+    }
 
 
 @pytest.mark.xfail(
@@ -596,12 +668,12 @@ def test_check_archs() -> None:
 def test_bads_report() -> None:
     # Test bads_report of architecture errors
     # No bads, no report
-    assert_equal(bads_report(set()), "")
+    assert bads_report(set()) == ""
     fmt_str_2 = "Required arch arm64 missing from {0}"
     fmt_str_3 = "{0} needs arch arm64 missing from {1}"
     # One line report
-    assert_equal(
-        bads_report({(LIB64, LIBM1, ARCH_M1)}), fmt_str_3.format(LIBM1, LIB64)
+    assert bads_report({(LIB64, LIBM1, ARCH_M1)}) == fmt_str_3.format(
+        LIBM1, LIB64
     )
     # One line report applying path stripper
     assert bads_report(
@@ -622,7 +694,7 @@ def test_bads_report() -> None:
         fmt_str_3.format(LIBBOTH, LIB64A),
     }
     # Set ordering undefined.
-    assert_equal(set(report.splitlines()), expected)
+    assert set(report.splitlines()) == expected
     # Two tuples and three tuples
     report2 = bads_report(
         {(LIB64A, LIBBOTH, ARCH_M1), (LIB64, ARCH_M1), (LIBM1, ARCH_M1)}
@@ -632,90 +704,95 @@ def test_bads_report() -> None:
         fmt_str_2.format(LIB64),
         fmt_str_2.format(LIBM1),
     }
-    assert_equal(set(report2.splitlines()), expected2)
+    assert set(report2.splitlines()) == expected2
     # Tuples must be length 2 or 3
-    assert_raises(
-        ValueError,
-        bads_report,
-        {(LIB64A, LIBBOTH, ARCH_M1), (LIB64,), (LIBM1, ARCH_M1)},
-    )
+    with pytest.raises(ValueError):
+        bads_report({(LIB64A, LIBBOTH, ARCH_M1), (LIB64,), (LIBM1, ARCH_M1)})
     # Tuples must be length 2 or 3
-    assert_raises(
-        ValueError,
-        bads_report,
-        {
-            (LIB64A, LIBBOTH, ARCH_M1),
-            (LIB64, LIB64, ARCH_M1, ARCH_64),
-            (LIBM1, ARCH_M1),
-        },
-    )
+    with pytest.raises(ValueError):
+        bads_report(
+            {
+                (LIB64A, LIBBOTH, ARCH_M1),
+                (LIB64, LIB64, ARCH_M1, ARCH_64),
+                (LIBM1, ARCH_M1),
+            }
+        )
 
 
 @pytest.mark.xfail(sys.platform != "darwin", reason="Needs macOS linkage")
-def test_dyld_library_path_lookups() -> None:
+def test_dyld_library_path_lookups(
+    libtree_template: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
     # Test that DYLD_LIBRARY_PATH can be used to find libs during
     # delocation
-    with TempDirWithoutEnvVars("DYLD_LIBRARY_PATH") as tmpdir:
-        # Copy libs into a temporary directory
-        subtree = pjoin(tmpdir, "subtree")
-        all_local_libs = _make_libtree(subtree)
-        liba, libb, libc, test_lib, slibc, stest_lib = all_local_libs
-        # move libb and confirm that test_lib doesn't work
-        hidden_dir = "hidden"
-        os.mkdir(hidden_dir)
-        new_libb = os.path.join(hidden_dir, os.path.basename(LIBB))
-        shutil.move(libb, new_libb)
-        with pytest.raises(subprocess.CalledProcessError):
-            subprocess.run([test_lib], check=True)
-        # Update DYLD_LIBRARY_PATH and confirm that we can now
-        # successfully delocate test_lib
-        os.environ["DYLD_LIBRARY_PATH"] = hidden_dir
-        delocate_path("subtree", "deplibs")
+    monkeypatch.delenv("DYLD_LIBRARY_PATH", raising=False)
+    tmpdir = str(tmp_path)
+    # Copy libs into a temporary directory
+    subtree = pjoin(tmpdir, "subtree")
+    all_local_libs = _make_libtree(subtree, libtree_template)
+    liba, libb, libc, test_lib, slibc, stest_lib = all_local_libs
+    # move libb and confirm that test_lib doesn't work
+    hidden_dir = pjoin(tmpdir, "hidden")
+    os.mkdir(hidden_dir)
+    new_libb = os.path.join(hidden_dir, os.path.basename(LIBB))
+    shutil.move(libb, new_libb)
+    with pytest.raises(subprocess.CalledProcessError):
         subprocess.run([test_lib], check=True)
+    # Update DYLD_LIBRARY_PATH and confirm that we can now
+    # successfully delocate test_lib
+    monkeypatch.setenv("DYLD_LIBRARY_PATH", hidden_dir)
+    delocate_path(subtree, pjoin(tmpdir, "deplibs"))
+    subprocess.run([test_lib], check=True)
 
 
 @pytest.mark.xfail(sys.platform != "darwin", reason="Needs macOS linkage")
-def test_dyld_library_path_beats_basename() -> None:
+def test_dyld_library_path_beats_basename(
+    libtree_template: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
     # Test that we find libraries on DYLD_LIBRARY_PATH before basename
-    with TempDirWithoutEnvVars("DYLD_LIBRARY_PATH") as tmpdir:
-        # Copy libs into a temporary directory
-        subtree = pjoin(tmpdir, "subtree")
-        all_local_libs = _make_libtree(subtree)
-        liba, libb, libc, test_lib, slibc, stest_lib = all_local_libs
-        # Copy liba into a subdirectory
-        subdir = os.path.join(subtree, "subdir")
-        os.mkdir(subdir)
-        new_libb = os.path.join(subdir, os.path.basename(LIBB))
-        shutil.copyfile(libb, new_libb)
-        # Without updating the environment variable, we find the lib normally
-        predicted_lib_location = search_environment_for_lib(libb)
-        # tmpdir can end up in /var, and that can be symlinked to
-        # /private/var, so we'll use realpath to resolve the two
-        assert_equal(predicted_lib_location, os.path.realpath(libb))
-        # Updating shows us the new lib
-        os.environ["DYLD_LIBRARY_PATH"] = subdir
-        predicted_lib_location = search_environment_for_lib(libb)
-        assert_equal(predicted_lib_location, realpath(new_libb))
+    monkeypatch.delenv("DYLD_LIBRARY_PATH", raising=False)
+    tmpdir = str(tmp_path)
+    # Copy libs into a temporary directory
+    subtree = pjoin(tmpdir, "subtree")
+    all_local_libs = _make_libtree(subtree, libtree_template)
+    liba, libb, libc, test_lib, slibc, stest_lib = all_local_libs
+    # Copy liba into a subdirectory
+    subdir = os.path.join(subtree, "subdir")
+    os.mkdir(subdir)
+    new_libb = os.path.join(subdir, os.path.basename(LIBB))
+    shutil.copyfile(libb, new_libb)
+    # Without updating the environment variable, we find the lib normally
+    predicted_lib_location = search_environment_for_lib(libb)
+    # tmpdir can end up in /var, and that can be symlinked to
+    # /private/var, so we'll use realpath to resolve the two
+    assert predicted_lib_location == os.path.realpath(libb)
+    # Updating shows us the new lib
+    monkeypatch.setenv("DYLD_LIBRARY_PATH", subdir)
+    predicted_lib_location = search_environment_for_lib(libb)
+    assert predicted_lib_location == realpath(new_libb)
 
 
 @pytest.mark.xfail(sys.platform != "darwin", reason="Needs macOS linkage")
-def test_dyld_fallback_library_path_loses_to_basename() -> None:
+def test_dyld_fallback_library_path_loses_to_basename(
+    libtree_template: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
     # Test that we find libraries on basename before DYLD_FALLBACK_LIBRARY_PATH
-    with TempDirWithoutEnvVars("DYLD_FALLBACK_LIBRARY_PATH") as tmpdir:
-        # Copy libs into a temporary directory
-        subtree = pjoin(tmpdir, "subtree")
-        all_local_libs = _make_libtree(subtree)
-        liba, libb, libc, test_lib, slibc, stest_lib = all_local_libs
-        # Copy liba into a subdirectory
-        subdir = "subdir"
-        os.mkdir(subdir)
-        new_libb = os.path.join(subdir, os.path.basename(LIBB))
-        shutil.copyfile(libb, new_libb)
-        os.environ["DYLD_FALLBACK_LIBRARY_PATH"] = subdir
-        predicted_lib_location = search_environment_for_lib(libb)
-        # tmpdir can end up in /var, and that can be symlinked to
-        # /private/var, so we'll use realpath to resolve the two
-        assert_equal(predicted_lib_location, os.path.realpath(libb))
+    monkeypatch.delenv("DYLD_FALLBACK_LIBRARY_PATH", raising=False)
+    tmpdir = str(tmp_path)
+    # Copy libs into a temporary directory
+    subtree = pjoin(tmpdir, "subtree")
+    all_local_libs = _make_libtree(subtree, libtree_template)
+    liba, libb, libc, test_lib, slibc, stest_lib = all_local_libs
+    # Copy liba into a subdirectory
+    subdir = pjoin(tmpdir, "subdir")
+    os.mkdir(subdir)
+    new_libb = os.path.join(subdir, os.path.basename(LIBB))
+    shutil.copyfile(libb, new_libb)
+    monkeypatch.setenv("DYLD_FALLBACK_LIBRARY_PATH", subdir)
+    predicted_lib_location = search_environment_for_lib(libb)
+    # tmpdir can end up in /var, and that can be symlinked to
+    # /private/var, so we'll use realpath to resolve the two
+    assert predicted_lib_location == os.path.realpath(libb)
 
 
 def test_get_archs_and_version_from_wheel_name() -> None:
@@ -747,3 +824,40 @@ def test_get_archs_and_version_from_wheel_name() -> None:
         _get_archs_and_version_from_wheel_name(
             "foo-1.0-py310-abi3-manylinux1.whl"
         )
+
+    # Cached results are shared, so they must not be mutable
+    archs = _get_archs_and_version_from_wheel_name(
+        "foo-1.0-py310-abi3-macosx_12_0_arm64.whl"
+    )
+    assert archs is _get_archs_and_version_from_wheel_name(
+        "foo-1.0-py310-abi3-macosx_12_0_arm64.whl"
+    )
+    with pytest.raises(TypeError):
+        archs["arm64"] = Version("13.0")  # type: ignore[index]
+
+
+def test_get_macos_min_version(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Test reading minimum macOS versions from Mach-O load commands
+    assert list(_get_macos_min_version(Path(LIBBOTH))) == [
+        ("x86_64", Version("10.9")),
+        ("ARM64", Version("11.0")),
+    ]
+    # Repeated calls parse the file once
+    libm1 = tmp_path / "libam1.dylib"
+    shutil.copyfile(LIBM1, libm1)
+    parsed: list[Path] = []
+
+    def counting_macho(path: Path) -> Any:
+        parsed.append(path)
+        return MachO(path)
+
+    monkeypatch.setattr(delocating, "MachO", counting_macho)
+    for _ in range(2):
+        assert list(_get_macos_min_version(libm1)) == [
+            ("ARM64", Version("11.0"))
+        ]
+    assert parsed == [libm1]
+    # Files which are not Mach-O have no versions
+    assert list(_get_macos_min_version(Path(__file__))) == []
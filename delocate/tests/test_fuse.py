@@ -1,125 +1,158 @@
 """Test fusing two directory trees / wheels."""
 
+from __future__ import annotations
+
 import os
 import shutil
-import subprocess
 import sys
-from os.path import basename, dirname, isdir, relpath
+from filecmp import dircmp
+from os.path import basename
 from os.path import join as pjoin
+from pathlib import Path
 
 import pytest
 
 from ..fuse import fuse_trees, fuse_wheels
-from ..tmpdirs import InTemporaryDirectory
-from ..tools import cmp_contents, dir2zip, get_archs, open_readable, zip2dir
+from ..tools import dir2zip, get_archs, open_readable, zip2dir
 from ..wheeltools import rewrite_record
-from .pytest_tools import assert_equal, assert_false
+from .file_tools import link_or_copy
 from .test_tools import LIB64, LIB64A, LIBM1
-from .test_wheelies import PURE_WHEEL
+from .test_wheelies import PURE_WHEEL, assert_wheel_unpacks
 from .test_wheeltools import assert_record_equal
 
+# Block size for comparing file contents
+_CMP_BLOCK_SIZE = 64 * 1024
 
-def assert_same_tree(tree1: str, tree2: str) -> None:
-    for dirpath, dirnames, filenames in os.walk(tree1):
-        tree2_dirpath = pjoin(tree2, relpath(dirpath, tree1))
-        for dname in dirnames:
-            assert isdir(pjoin(tree2_dirpath, dname))
-        for fname in filenames:
-            tree1_path = pjoin(dirpath, fname)
-            with open_readable(tree1_path, "rb") as fobj:
+
+def _same_contents(path1: str, path2: str) -> bool:
+    """Return True if files `path1` and `path2` have the same contents.
+
+    Checks the file sizes and whether the two paths are the same (or
+    hardlinked) file before comparing contents a block at a time.
+    """
+    stat1, stat2 = os.stat(path1), os.stat(path2)
+    if stat1.st_size != stat2.st_size:
+        return False
+    if (stat1.st_dev, stat1.st_ino) == (stat2.st_dev, stat2.st_ino):
+        return True
+    with open_readable(path1, "rb") as fobj1:
+        with open_readable(path2, "rb") as fobj2:
+            while True:
+                block1 = fobj1.read(_CMP_BLOCK_SIZE)
+                if block1 != fobj2.read(_CMP_BLOCK_SIZE):
+                    return False
+                if not block1:
+                    return True
+
+
+def _assert_same_dircmp(cmp: dircmp[str]) -> None:
+    assert not cmp.left_only, cmp.left_only
+    assert not cmp.common_funny, cmp.common_funny
+    for fname in cmp.common_files:
+        path1, path2 = pjoin(cmp.left, fname), pjoin(cmp.right, fname)
+        if fname == "RECORD":  # Record can have different line orders
+            with open_readable(path1, "rb") as fobj:
                 contents1 = fobj.read()
-            with open_readable(pjoin(tree2_dirpath, fname), "rb") as fobj:
+            with open_readable(path2, "rb") as fobj:
                 contents2 = fobj.read()
-            if fname == "RECORD":  # Record can have different line orders
-                assert_record_equal(contents1, contents2)
-            else:
-                assert contents1 == contents2
+            assert_record_equal(contents1, contents2)
+        else:
+            assert _same_contents(path1, path2), path1
+    for sub_cmp in cmp.subdirs.values():
+        _assert_same_dircmp(sub_cmp)
+
+
+def assert_same_tree(tree1: str, tree2: str) -> None:
+    # Compare all of tree1, including files dircmp ignores by default
+    _assert_same_dircmp(dircmp(tree1, tree2, ignore=[]))
 
 
 def assert_listdir_equal(path, listing):
-    assert sorted(os.listdir(path)) == sorted(listing)
+    assert set(os.listdir(path)) == set(listing)
 
 
 @pytest.mark.xfail(sys.platform != "darwin", reason="lipo")
-def test_fuse_trees():
+def test_fuse_trees(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
     # Test function to fuse two paths
-    with InTemporaryDirectory():
-        os.mkdir("tree1")
-        os.mkdir("tree2")
-        fuse_trees("tree1", "tree2")
-        assert_listdir_equal("tree1", [])
-        with open(pjoin("tree2", "afile.txt"), "w") as fobj:
-            fobj.write("Some text")
-        fuse_trees("tree1", "tree2")
-        assert_listdir_equal("tree1", ["afile.txt"])
-        assert_same_tree("tree1", "tree2")
-        # Copy this test directory, show it turns up in output
-        shutil.copytree(dirname(__file__), pjoin("tree2", "tests"))
-        fuse_trees("tree1", "tree2")
-        assert_listdir_equal("tree1", ["afile.txt", "tests"])
-        assert_same_tree("tree1", "tree2")
-        # A library, not matched in to_tree
-        shutil.copy2(LIB64A, "tree2")
-        fuse_trees("tree1", "tree2")
-        assert_listdir_equal("tree1", ["afile.txt", "liba.a", "tests"])
-        assert_same_tree("tree1", "tree2")
-        # Run the same again; this tests that there is no error when the
-        # library is the same in both trees
-        fuse_trees("tree1", "tree2")
-        assert_same_tree("tree1", "tree2")
-        # Real fuse
-        shutil.copyfile(LIB64, pjoin("tree2", "tests", "liba.dylib"))
-        shutil.copyfile(LIBM1, pjoin("tree1", "tests", "liba.dylib"))
-        fuse_trees("tree1", "tree2")
-        fused_fname = pjoin("tree1", "tests", "liba.dylib")
-        assert_false(
-            cmp_contents(fused_fname, pjoin("tree2", "tests", "liba.dylib"))
-        )
-        assert_equal(get_archs(fused_fname), {"arm64", "x86_64"})
-        os.unlink(fused_fname)
-        # A file not present in tree2 stays in tree1
-        with open(pjoin("tree1", "anotherfile.txt"), "w") as fobj:
-            fobj.write("Some more text")
-        fuse_trees("tree1", "tree2")
-        assert_listdir_equal(
-            "tree1", ["afile.txt", "anotherfile.txt", "liba.a", "tests"]
-        )
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("tree1")
+    os.mkdir("tree2")
+    fuse_trees("tree1", "tree2")
+    assert_listdir_equal("tree1", [])
+    with open(pjoin("tree2", "afile.txt"), "w") as fobj:
+        fobj.write("Some text")
+    fuse_trees("tree1", "tree2")
+    assert_listdir_equal("tree1", ["afile.txt"])
+    assert_same_tree("tree1", "tree2")
+    # Make a small directory tree, show it turns up in output
+    os.makedirs(pjoin("tree2", "tests", "data"))
+    with open(pjoin("tree2", "tests", "a.txt"), "w") as fobj:
+        fobj.write("x")
+    with open(pjoin("tree2", "tests", "data", "b.txt"), "w") as fobj:
+        fobj.write("y")
+    fuse_trees("tree1", "tree2")
+    assert_listdir_equal("tree1", ["afile.txt", "tests"])
+    assert_same_tree("tree1", "tree2")
+    # A library, not matched in to_tree
+    link_or_copy(LIB64A, pjoin("tree2", "liba.a"))
+    fuse_trees("tree1", "tree2")
+    assert_listdir_equal("tree1", ["afile.txt", "liba.a", "tests"])
+    assert_same_tree("tree1", "tree2")
+    # Run the same again; this tests that there is no error when the
+    # library is the same in both trees
+    fuse_trees("tree1", "tree2")
+    assert_same_tree("tree1", "tree2")
+    # Real fuse
+    link_or_copy(LIB64, pjoin("tree2", "tests", "liba.dylib"))
+    shutil.copyfile(LIBM1, pjoin("tree1", "tests", "liba.dylib"))
+    fuse_trees("tree1", "tree2")
+    fused_fname = pjoin("tree1", "tests", "liba.dylib")
+    assert not _same_contents(
+        fused_fname, pjoin("tree2", "tests", "liba.dylib")
+    )
+    assert get_archs(fused_fname) == {"arm64", "x86_64"}
+    os.unlink(fused_fname)
+    # A file not present in tree2 stays in tree1
+    with open(pjoin("tree1", "anotherfile.txt"), "w") as fobj:
+        fobj.write("Some more text")
+    fuse_trees("tree1", "tree2")
+    assert_listdir_equal(
+        "tree1", ["afile.txt", "anotherfile.txt", "liba.a", "tests"]
+    )
 
 
 @pytest.mark.xfail(sys.platform != "darwin", reason="lipo")
-def test_fuse_wheels() -> None:
+def test_fuse_wheels(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
     # Test function to fuse two wheels
     wheel_base = basename(PURE_WHEEL)
-    with InTemporaryDirectory():
-        zip2dir(PURE_WHEEL, "to_wheel")
-        zip2dir(PURE_WHEEL, "from_wheel")
-        dir2zip("to_wheel", "to_wheel.whl")
-        dir2zip("from_wheel", "from_wheel.whl")
-        fuse_wheels("to_wheel.whl", "from_wheel.whl", wheel_base)
-        zip2dir(wheel_base, "fused_wheel")
-        assert_same_tree("to_wheel", "fused_wheel")
-        # Check unpacking works on fused wheel
-        subprocess.run(
-            [sys.executable, "-m", "wheel", "unpack", wheel_base], check=True
-        )
-        # Put lib into wheel
-        shutil.copyfile(LIB64A, pjoin("from_wheel", "fakepkg2", "liba.a"))
-        rewrite_record("from_wheel")
-        dir2zip("from_wheel", "from_wheel.whl")
-        fuse_wheels("to_wheel.whl", "from_wheel.whl", wheel_base)
-        zip2dir(wheel_base, "fused_wheel")
-        assert_same_tree("fused_wheel", "from_wheel")
-        # Check we can fuse two identical wheels with a library in
-        # (checks that fuse doesn't error for identical library)
-        fuse_wheels(wheel_base, "from_wheel.whl", wheel_base)
-        zip2dir(wheel_base, "fused_wheel")
-        assert_same_tree("fused_wheel", "from_wheel")
-        # Test fusing a library
-        shutil.copyfile(LIB64, pjoin("from_wheel", "fakepkg2", "liba.dylib"))
-        shutil.copyfile(LIBM1, pjoin("to_wheel", "fakepkg2", "liba.dylib"))
-        dir2zip("from_wheel", "from_wheel.whl")
-        dir2zip("to_wheel", "to_wheel.whl")
-        fuse_wheels("to_wheel.whl", "from_wheel.whl", wheel_base)
-        zip2dir(wheel_base, "fused_wheel")
-        fused_fname = pjoin("fused_wheel", "fakepkg2", "liba.dylib")
-        assert get_archs(fused_fname) == set(("arm64", "x86_64"))
+    monkeypatch.chdir(tmp_path)
+    zip2dir(PURE_WHEEL, "to_wheel")
+    zip2dir(PURE_WHEEL, "from_wheel")
+    dir2zip("to_wheel", "to_wheel.whl")
+    dir2zip("from_wheel", "from_wheel.whl")
+    fuse_wheels("to_wheel.whl", "from_wheel.whl", wheel_base)
+    zip2dir(wheel_base, "fused_wheel")
+    assert_same_tree("to_wheel", "fused_wheel")
+    # Check unpacking works on fused wheel
+    assert_wheel_unpacks(wheel_base)
+    # Put lib into wheel
+    link_or_copy(LIB64A, pjoin("from_wheel", "fakepkg2", "liba.a"))
+    rewrite_record("from_wheel")
+    dir2zip("from_wheel", "from_wheel.whl")
+    fuse_wheels("to_wheel.whl", "from_wheel.whl", wheel_base)
+    zip2dir(wheel_base, "fused_wheel")
+    assert_same_tree("fused_wheel", "from_wheel")
+    # Check we can fuse two identical wheels with a library in
+    # (checks that fuse doesn't error for identical library)
+    fuse_wheels(wheel_base, "from_wheel.whl", wheel_base)
+    zip2dir(wheel_base, "fused_wheel")
+    assert_same_tree("fused_wheel", "from_wheel")
+    # Test fusing a library
+    link_or_copy(LIB64, pjoin("from_wheel", "fakepkg2", "liba.dylib"))
+    shutil.copyfile(LIBM1, pjoin("to_wheel", "fakepkg2", "liba.dylib"))
+    dir2zip("from_wheel", "from_wheel.whl")
+    dir2zip("to_wheel", "to_wheel.whl")
+    fuse_wheels("to_wheel.whl", "from_wheel.whl", wheel_base)
+    zip2dir(wheel_base, "fused_wheel")
+    fused_fname = pjoin("fused_wheel", "fakepkg2", "liba.dylib")
+    assert get_archs(fused_fname) == set(("arm64", "x86_64"))
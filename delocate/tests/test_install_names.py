@@ -3,23 +3,28 @@
 from __future__ import annotations
 
 import contextlib
+import functools
 import os
 import shutil
+import subprocess
 import sys
 from collections.abc import Sequence
-from os.path import basename, dirname, exists
+from os.path import basename, dirname, realpath
 from os.path import join as pjoin
+from pathlib import Path
 from subprocess import CompletedProcess
 from typing import (
     NamedTuple,
 )
-from unittest import mock
 
 import pytest
 
-from ..tmpdirs import InTemporaryDirectory
+from .. import tools
 from ..tools import (
     InstallNameError,
+    _get_install_ids,
+    _get_rpaths,
+    _read_load_commands,
     add_rpath,
     get_environment_variable_paths,
     get_install_id,
@@ -28,15 +33,25 @@ from ..tools import (
     parse_install_name,
     set_install_id,
     set_install_name,
+    set_install_names,
 )
-from .env_tools import TempDirWithoutEnvVars
-from .pytest_tools import assert_equal, assert_raises
 
 # External libs linked from test data
 LIBSTDCXX = "/usr/lib/libc++.1.dylib"
 LIBSYSTEMB = "/usr/lib/libSystem.B.dylib"
 EXT_LIBS = (LIBSTDCXX, LIBSYSTEMB)
 
+
+@functools.cache
+def resolved_ext_libs() -> tuple[tuple[str, str], ...]:
+    """Return ``(realpath, install name)`` pairs for each of `EXT_LIBS`.
+
+    The paths are resolved on first use, rather than at import, and then
+    reused, as the system libraries do not move during a test run.
+    """
+    return tuple((realpath(ext_lib), ext_lib) for ext_lib in EXT_LIBS)
+
+
 DATA_PATH = pjoin(dirname(__file__), "data")
 LIBA = pjoin(DATA_PATH, "liba.dylib")
 LIBB = pjoin(DATA_PATH, "libb.dylib")
@@ -51,15 +66,13 @@ BIN_FILE = pjoin(DATA_PATH, "binary_example.bin")
 
 
 @pytest.mark.xfail(sys.platform != "darwin", reason="otool")
-def test_get_install_names() -> None:
+def test_get_install_names(tmp_path: Path) -> None:
     # Test install name listing
-    assert set(get_install_names(LIBA)) == set(EXT_LIBS)
-    assert set(get_install_names(LIBB)) == set(("liba.dylib",) + EXT_LIBS)
-    assert set(get_install_names(LIBC)) == set(
-        ("liba.dylib", "libb.dylib") + EXT_LIBS
-    )
-    assert set(get_install_names(TEST_LIB)) == set(("libc.dylib",) + EXT_LIBS)
-    assert set(get_install_names(LIBAM1_ARCH)) == set(EXT_LIBS)
+    assert get_install_names(LIBA) == EXT_LIBS
+    assert get_install_names(LIBB) == ("liba.dylib",) + EXT_LIBS
+    assert get_install_names(LIBC) == ("liba.dylib", "libb.dylib") + EXT_LIBS
+    assert get_install_names(TEST_LIB) == ("libc.dylib",) + EXT_LIBS
+    assert get_install_names(LIBAM1_ARCH) == EXT_LIBS
     # Non-object file returns empty tuple
     assert get_install_names(__file__) == ()
     # Static archive and object files returns empty tuple
@@ -72,83 +85,90 @@ def test_get_install_names() -> None:
     # Binary file (in fact a truncated SAS file)
     assert get_install_names(BIN_FILE) == ()
     # Test when no read permission
-    with InTemporaryDirectory():
-        shutil.copyfile(LIBA, "test.dylib")
-        assert set(get_install_names("test.dylib")) == set(EXT_LIBS)
-        # No permissions, no found libs
-        os.chmod("test.dylib", 0)
-        assert get_install_names("test.dylib") == ()
+    test_dylib = str(tmp_path / "test.dylib")
+    shutil.copyfile(LIBA, test_dylib)
+    assert get_install_names(test_dylib) == EXT_LIBS
+    # No permissions, no found libs
+    os.chmod(test_dylib, 0)
+    assert get_install_names(test_dylib) == ()
 
 
 def test_parse_install_name():
-    assert_equal(
-        parse_install_name(
-            "liba.dylib (compatibility version 0.0.0, current version 0.0.0)"
-        ),
-        ("liba.dylib", "0.0.0", "0.0.0"),
-    )
-    assert_equal(
-        parse_install_name(
-            " /usr/lib/libstdc++.6.dylib (compatibility version 1.0.0, "
-            "current version 120.0.0)"
-        ),
-        ("/usr/lib/libstdc++.6.dylib", "1.0.0", "120.0.0"),
-    )
-    assert_equal(
-        parse_install_name(
-            "\t\t   /usr/lib/libSystem.B.dylib (compatibility version 1.0.0, "
-            "current version 1197.1.1)"
-        ),
-        ("/usr/lib/libSystem.B.dylib", "1.0.0", "1197.1.1"),
-    )
+    assert parse_install_name(
+        "liba.dylib (compatibility version 0.0.0, current version 0.0.0)"
+    ) == ("liba.dylib", "0.0.0", "0.0.0")
+    assert parse_install_name(
+        " /usr/lib/libstdc++.6.dylib (compatibility version 1.0.0, "
+        "current version 120.0.0)"
+    ) == ("/usr/lib/libstdc++.6.dylib", "1.0.0", "120.0.0")
+    assert parse_install_name(
+        "\t\t   /usr/lib/libSystem.B.dylib (compatibility version 1.0.0, "
+        "current version 1197.1.1)"
+    ) == ("/usr/lib/libSystem.B.dylib", "1.0.0", "1197.1.1")
 
 
 @pytest.mark.xfail(sys.platform != "darwin", reason="otool")
 def test_install_id():
     # Test basic otool library listing
-    assert_equal(get_install_id(LIBA), "liba.dylib")
-    assert_equal(get_install_id(LIBB), "libb.dylib")
-    assert_equal(get_install_id(LIBC), "libc.dylib")
-    assert_equal(get_install_id(TEST_LIB), None)
+    assert get_install_id(LIBA) == "liba.dylib"
+    assert get_install_id(LIBB) == "libb.dylib"
+    assert get_install_id(LIBC) == "libc.dylib"
+    assert get_install_id(TEST_LIB) is None
     # Non-object file returns None too
-    assert_equal(get_install_id(__file__), None)
-    assert_equal(get_install_id(ICO_FILE), None)
+    assert get_install_id(__file__) is None
+    assert get_install_id(ICO_FILE) is None
 
 
 @pytest.mark.xfail(sys.platform != "darwin", reason="otool")
-def test_change_install_name():
+def test_change_install_name(tmp_path: Path) -> None:
     # Test ability to change install names in library
     libb_names = get_install_names(LIBB)
-    with InTemporaryDirectory() as tmpdir:
-        libfoo = pjoin(tmpdir, "libfoo.dylib")
-        shutil.copy2(LIBB, libfoo)
-        assert_equal(get_install_names(libfoo), libb_names)
-        set_install_name(libfoo, "liba.dylib", "libbar.dylib")
-        assert_equal(
-            get_install_names(libfoo), ("libbar.dylib",) + libb_names[1:]
-        )
-        # If the name not found, raise an error
-        assert_raises(
-            InstallNameError,
-            set_install_name,
+    libfoo = str(tmp_path / "libfoo.dylib")
+    shutil.copyfile(LIBB, libfoo)
+    assert get_install_names(libfoo) == libb_names
+    set_install_name(libfoo, "liba.dylib", "libbar.dylib")
+    assert get_install_names(libfoo) == ("libbar.dylib",) + libb_names[1:]
+    # If the name not found, raise an error
+    with pytest.raises(InstallNameError):
+        set_install_name(libfoo, "liba.dylib", "libpho.dylib")
+
+
+@pytest.mark.xfail(sys.platform != "darwin", reason="otool")
+def test_change_install_names(tmp_path: Path) -> None:
+    # Test changing several install names with one command
+    libc_names = get_install_names(LIBC)
+    libfoo = str(tmp_path / "libfoo.dylib")
+    shutil.copyfile(LIBC, libfoo)
+    new_names = {"liba.dylib": "libbar.dylib", "libb.dylib": "libbaz.dylib"}
+    set_install_names(libfoo, new_names.items())
+    assert get_install_names(libfoo) == tuple(
+        new_names.get(name, name) for name in libc_names
+    )
+    # No changes, nothing to do
+    set_install_names(libfoo, [])
+    # If any name not found, raise an error
+    with pytest.raises(InstallNameError):
+        set_install_names(
             libfoo,
-            "liba.dylib",
-            "libpho.dylib",
+            [
+                ("libbar.dylib", "libpho.dylib"),
+                ("liba.dylib", "libpho.dylib"),
+            ],
         )
 
 
 @pytest.mark.xfail(sys.platform != "darwin", reason="otool")
-def test_set_install_id():
+def test_set_install_id(tmp_path: Path) -> None:
     # Test ability to change install id in library
     liba_id = get_install_id(LIBA)
-    with InTemporaryDirectory() as tmpdir:
-        libfoo = pjoin(tmpdir, "libfoo.dylib")
-        shutil.copy2(LIBA, libfoo)
-        assert_equal(get_install_id(libfoo), liba_id)
-        set_install_id(libfoo, "libbar.dylib")
-        assert_equal(get_install_id(libfoo), "libbar.dylib")
+    libfoo = str(tmp_path / "libfoo.dylib")
+    shutil.copyfile(LIBA, libfoo)
+    assert get_install_id(libfoo) == liba_id
+    set_install_id(libfoo, "libbar.dylib")
+    assert get_install_id(libfoo) == "libbar.dylib"
     # If no install id, raise error (unlike install_name_tool)
-    assert_raises(InstallNameError, set_install_id, TEST_LIB, "libbof.dylib")
+    with pytest.raises(InstallNameError):
+        set_install_id(TEST_LIB, "libbof.dylib")
 
 
 @pytest.mark.xfail(sys.platform != "darwin", reason="otool")
@@ -159,36 +179,60 @@ def test_get_rpaths() -> None:
         assert get_rpaths(fname) == ()
 
 
-def test_get_environment_variable_paths():
+def test_read_load_commands(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Install names, ids and rpaths are read without running otool
+    def no_run(*args: object, **kwargs: object) -> None:
+        raise AssertionError("Unexpected subprocess")
+
+    monkeypatch.setattr(tools, "_run", no_run)
+    assert get_install_names(LIBB) == ("liba.dylib",) + EXT_LIBS
+    assert get_install_names(TEST_LIB) == ("libc.dylib",) + EXT_LIBS
+    assert _get_install_ids(LIBC) == {"": "libc.dylib"}
+    assert _get_install_ids(TEST_LIB) == {}
+    # Universal files are split by architecture
+    assert _get_install_ids(LIBAM1_ARCH) == {"arm64": "libam1.dylib"}
+    rpaths = ["@executable_path/", "@loader_path/"]
+    assert _get_rpaths(pjoin(DATA_PATH, "libextfunc_rpath.dylib")) == {
+        "x86_64": rpaths,
+        "arm64": rpaths,
+    }
+    assert _get_rpaths(LIBB) == {"": []}
+    # Files which cannot be parsed are left to otool
+    assert _read_load_commands(LIBA_STATIC) is None
+    truncated = tmp_path / "truncated.dylib"
+    truncated.write_bytes(Path(LIBA).read_bytes()[:64])
+    assert _read_load_commands(truncated) is None
+
+
+def test_get_environment_variable_paths(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
     # Test that environment variable paths are fetched in a specific order
-    with TempDirWithoutEnvVars(
-        "DYLD_FALLBACK_LIBRARY_PATH", "DYLD_LIBRARY_PATH"
-    ):
-        os.environ["DYLD_FALLBACK_LIBRARY_PATH"] = "three"
-        os.environ["DYLD_LIBRARY_PATH"] = "two"
-        assert_equal(get_environment_variable_paths(), ("two", "three"))
+    monkeypatch.setenv("DYLD_FALLBACK_LIBRARY_PATH", "three")
+    monkeypatch.setenv("DYLD_LIBRARY_PATH", "two")
+    assert get_environment_variable_paths() == ("two", "three")
 
 
 @pytest.mark.xfail(sys.platform != "darwin", reason="otool")
-def test_add_rpath():
+def test_add_rpath(tmp_path: Path) -> None:
     # Test adding to rpath
-    with InTemporaryDirectory() as tmpdir:
-        libfoo = pjoin(tmpdir, "libfoo.dylib")
-        shutil.copy2(LIBB, libfoo)
-        assert_equal(get_rpaths(libfoo), ())
-        add_rpath(libfoo, "/a/path")
-        assert_equal(get_rpaths(libfoo), ("/a/path",))
-        add_rpath(libfoo, "/another/path")
-        assert_equal(get_rpaths(libfoo), ("/a/path", "/another/path"))
+    libfoo = str(tmp_path / "libfoo.dylib")
+    shutil.copyfile(LIBB, libfoo)
+    assert get_rpaths(libfoo) == ()
+    add_rpath(libfoo, "/a/path")
+    assert get_rpaths(libfoo) == ("/a/path",)
+    add_rpath(libfoo, "/another/path")
+    assert get_rpaths(libfoo) == ("/a/path", "/another/path")
 
 
 def _copy_libs(lib_files, out_path):
     copied = []
-    if not exists(out_path):
-        os.makedirs(out_path)
+    os.makedirs(out_path, exist_ok=True)
     for in_fname in lib_files:
         out_fname = pjoin(out_path, basename(in_fname))
-        shutil.copy2(in_fname, out_fname)
+        shutil.copyfile(in_fname, out_fname)
         copied.append(out_fname)
     return copied
 
@@ -422,14 +466,21 @@ cmdsize 0
             expected_rpaths=("path/x86_64",),
         ),
     ],
+    ids=[
+        "single-arch",
+        "multi-arch",
+        "multi-arch-mismatched-names",
+        "multi-arch-mismatched-ids",
+    ],
 )
-def test_names_multi(arch_def: ToolArchMock) -> None:
-    with mock.patch("subprocess.run", arch_def.mock_subprocess_run):
-        with mock.patch("delocate.tools._is_macho_file", return_value=True):
-            with assert_raises_if_exception(arch_def.expected_install_names):
-                assert (
-                    get_install_names("example.so")
-                    == arch_def.expected_install_names
-                )
-            with assert_raises_if_exception(arch_def.expected_rpaths):
-                assert get_rpaths("example.so") == arch_def.expected_rpaths
+def test_names_multi(
+    arch_def: ToolArchMock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(subprocess, "run", arch_def.mock_subprocess_run)
+    monkeypatch.setattr(tools, "_is_macho_file", lambda filename: True)
+    with assert_raises_if_exception(arch_def.expected_install_names):
+        assert (
+            get_install_names("example.so") == arch_def.expected_install_names
+        )
+    with assert_raises_if_exception(arch_def.expected_rpaths):
+        assert get_rpaths("example.so") == arch_def.expected_rpaths
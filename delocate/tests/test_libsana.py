@@ -10,6 +10,7 @@ import sys
 from collections.abc import Iterable
 from os.path import dirname, realpath, relpath, split
 from os.path import join as pjoin
+from pathlib import Path
 from unittest import mock
 
 import pytest
@@ -30,9 +31,7 @@ from ..libsana import (
     walk_library,
     wheel_libs,
 )
-from ..tmpdirs import InTemporaryDirectory
 from ..tools import set_install_name
-from .env_tools import TempDirWithoutEnvVars
 from .pytest_tools import assert_equal
 from .test_install_names import (
     DATA_PATH,
@@ -43,222 +42,225 @@ from .test_install_names import (
     LIBSYSTEMB,
     TEST_LIB,
     _copy_libs,
+    resolved_ext_libs,
 )
 from .test_wheelies import PLAT_WHEEL, PURE_WHEEL, RPATH_WHEEL, PlatWheel
 
 
 def get_ext_dict(local_libs: Iterable[str]) -> dict[str, dict[str, str]]:
-    ext_deps = {}
-    for ext_lib in EXT_LIBS:
-        lib_deps = {}
-        for local_lib in local_libs:
-            lib_deps[realpath(local_lib)] = ext_lib
-        ext_deps[realpath(ext_lib)] = lib_deps
-    return ext_deps
+    rp_local_libs = [realpath(local_lib) for local_lib in local_libs]
+    return {
+        rp_ext_lib: dict.fromkeys(rp_local_libs, ext_lib)
+        for rp_ext_lib, ext_lib in resolved_ext_libs()
+    }
 
 
 @pytest.mark.xfail(sys.platform != "darwin", reason="otool")
 @pytest.mark.filterwarnings("ignore:tree_libs:DeprecationWarning")
-def test_tree_libs() -> None:
+def test_tree_libs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
     # Test ability to walk through tree, finding dynamic library refs
     # Copy specific files to avoid working tree cruft
     to_copy = [LIBA, LIBB, LIBC, TEST_LIB]
-    with InTemporaryDirectory() as tmpdir:
-        local_libs = _copy_libs(to_copy, tmpdir)
-        rp_local_libs = [realpath(L) for L in local_libs]
-        liba, libb, libc, test_lib = local_libs
-        rp_liba, rp_libb, rp_libc, rp_test_lib = rp_local_libs
-        exp_dict = get_ext_dict(local_libs)
-        exp_dict.update(
-            {
-                rp_liba: {rp_libb: "liba.dylib", rp_libc: "liba.dylib"},
-                rp_libb: {rp_libc: "libb.dylib"},
-                rp_libc: {rp_test_lib: "libc.dylib"},
-            }
-        )
-        # default - no filtering
-        assert tree_libs(tmpdir) == exp_dict
-
-        def filt(fname: str) -> bool:
-            return fname.endswith(".dylib")
-
-        exp_dict = get_ext_dict([liba, libb, libc])
-        exp_dict.update(
-            {
-                rp_liba: {rp_libb: "liba.dylib", rp_libc: "liba.dylib"},
-                rp_libb: {rp_libc: "libb.dylib"},
-            }
-        )
-        # filtering
-        assert tree_libs(tmpdir, filt) == exp_dict
-        # Copy some libraries into subtree to test tree walking
-        subtree = pjoin(tmpdir, "subtree")
-        slibc, stest_lib = _copy_libs([libc, test_lib], subtree)
-        st_exp_dict = get_ext_dict([liba, libb, libc, slibc])
-        st_exp_dict.update(
-            {
-                rp_liba: {
-                    rp_libb: "liba.dylib",
-                    rp_libc: "liba.dylib",
-                    realpath(slibc): "liba.dylib",
-                },
-                rp_libb: {
-                    rp_libc: "libb.dylib",
-                    realpath(slibc): "libb.dylib",
-                },
-            }
-        )
-        assert tree_libs(tmpdir, filt) == st_exp_dict
-        # Change an install name, check this is picked up
-        set_install_name(slibc, "liba.dylib", "newlib")
-        inc_exp_dict = get_ext_dict([liba, libb, libc, slibc])
-        inc_exp_dict.update(
-            {
-                rp_liba: {rp_libb: "liba.dylib", rp_libc: "liba.dylib"},
-                realpath("newlib"): {realpath(slibc): "newlib"},
-                rp_libb: {
-                    rp_libc: "libb.dylib",
-                    realpath(slibc): "libb.dylib",
-                },
-            }
-        )
-        assert tree_libs(tmpdir, filt) == inc_exp_dict
-        # Symlink a depending canonical lib - should have no effect because of
-        # the canonical names
-        os.symlink(liba, pjoin(dirname(liba), "funny.dylib"))
-        assert tree_libs(tmpdir, filt) == inc_exp_dict
-        # Symlink a depended lib.  Now 'newlib' is a symlink to liba, and the
-        # dependency of slibc on newlib appears as a dependency on liba, but
-        # with install name 'newlib'
-        os.symlink(liba, "newlib")
-        sl_exp_dict = get_ext_dict([liba, libb, libc, slibc])
-        sl_exp_dict.update(
-            {
-                rp_liba: {
-                    rp_libb: "liba.dylib",
-                    rp_libc: "liba.dylib",
-                    realpath(slibc): "newlib",
-                },
-                rp_libb: {
-                    rp_libc: "libb.dylib",
-                    realpath(slibc): "libb.dylib",
-                },
-            }
-        )
-        assert tree_libs(tmpdir, filt) == sl_exp_dict
+    tmpdir = str(tmp_path)
+    monkeypatch.chdir(tmpdir)  # Bare install names resolve from here
+    local_libs = _copy_libs(to_copy, tmpdir)
+    rp_local_libs = [realpath(L) for L in local_libs]
+    liba, libb, libc, test_lib = local_libs
+    rp_liba, rp_libb, rp_libc, rp_test_lib = rp_local_libs
+    exp_dict = get_ext_dict(local_libs)
+    exp_dict.update(
+        {
+            rp_liba: {rp_libb: "liba.dylib", rp_libc: "liba.dylib"},
+            rp_libb: {rp_libc: "libb.dylib"},
+            rp_libc: {rp_test_lib: "libc.dylib"},
+        }
+    )
+    # default - no filtering
+    assert tree_libs(tmpdir) == exp_dict
+
+    def filt(fname: str) -> bool:
+        return fname.endswith(".dylib")
+
+    exp_dict = get_ext_dict([liba, libb, libc])
+    exp_dict.update(
+        {
+            rp_liba: {rp_libb: "liba.dylib", rp_libc: "liba.dylib"},
+            rp_libb: {rp_libc: "libb.dylib"},
+        }
+    )
+    # filtering
+    assert tree_libs(tmpdir, filt) == exp_dict
+    # Copy some libraries into subtree to test tree walking
+    subtree = pjoin(tmpdir, "subtree")
+    slibc, stest_lib = _copy_libs([libc, test_lib], subtree)
+    st_exp_dict = get_ext_dict([liba, libb, libc, slibc])
+    st_exp_dict.update(
+        {
+            rp_liba: {
+                rp_libb: "liba.dylib",
+                rp_libc: "liba.dylib",
+                realpath(slibc): "liba.dylib",
+            },
+            rp_libb: {
+                rp_libc: "libb.dylib",
+                realpath(slibc): "libb.dylib",
+            },
+        }
+    )
+    assert tree_libs(tmpdir, filt) == st_exp_dict
+    # Change an install name, check this is picked up
+    set_install_name(slibc, "liba.dylib", "newlib")
+    inc_exp_dict = get_ext_dict([liba, libb, libc, slibc])
+    inc_exp_dict.update(
+        {
+            rp_liba: {rp_libb: "liba.dylib", rp_libc: "liba.dylib"},
+            realpath("newlib"): {realpath(slibc): "newlib"},
+            rp_libb: {
+                rp_libc: "libb.dylib",
+                realpath(slibc): "libb.dylib",
+            },
+        }
+    )
+    assert tree_libs(tmpdir, filt) == inc_exp_dict
+    # Symlink a depending canonical lib - should have no effect because of
+    # the canonical names
+    os.symlink(liba, pjoin(dirname(liba), "funny.dylib"))
+    assert tree_libs(tmpdir, filt) == inc_exp_dict
+    # Symlink a depended lib.  Now 'newlib' is a symlink to liba, and the
+    # dependency of slibc on newlib appears as a dependency on liba, but
+    # with install name 'newlib'
+    os.symlink(liba, "newlib")
+    sl_exp_dict = get_ext_dict([liba, libb, libc, slibc])
+    sl_exp_dict.update(
+        {
+            rp_liba: {
+                rp_libb: "liba.dylib",
+                rp_libc: "liba.dylib",
+                realpath(slibc): "newlib",
+            },
+            rp_libb: {
+                rp_libc: "libb.dylib",
+                realpath(slibc): "libb.dylib",
+            },
+        }
+    )
+    assert tree_libs(tmpdir, filt) == sl_exp_dict
 
 
 @pytest.mark.xfail(sys.platform != "darwin", reason="otool")
-def test_tree_libs_from_directory() -> None:
+def test_tree_libs_from_directory(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
     # Test ability to walk through tree, finding dynamic library refs
     # Copy specific files to avoid working tree cruft
     to_copy = [LIBA, LIBB, LIBC, TEST_LIB]
-    with InTemporaryDirectory() as tmpdir:
-        local_libs = _copy_libs(to_copy, tmpdir)
-        rp_local_libs = [realpath(L) for L in local_libs]
-        liba, libb, libc, test_lib = local_libs
-        rp_liba, rp_libb, rp_libc, rp_test_lib = rp_local_libs
-        exp_dict = get_ext_dict(local_libs)
-        exp_dict.update(
-            {
-                rp_liba: {rp_libb: "liba.dylib", rp_libc: "liba.dylib"},
-                rp_libb: {rp_libc: "libb.dylib"},
-                rp_libc: {rp_test_lib: "libc.dylib"},
-            }
-        )
-        # default - no filtering
-        assert tree_libs_from_directory(tmpdir) == exp_dict
-
-        def filt(fname: str) -> bool:
-            return filter_system_libs(fname) and fname.endswith(".dylib")
-
-        exp_dict = get_ext_dict([liba, libb, libc])
-        exp_dict.update(
-            {
-                rp_liba: {rp_libb: "liba.dylib", rp_libc: "liba.dylib"},
-                rp_libb: {rp_libc: "libb.dylib"},
-            }
-        )
-        # filtering
-        assert tree_libs_from_directory(tmpdir, lib_filt_func=filt) == exp_dict
-        # Copy some libraries into subtree to test tree walking
-        subtree = pjoin(tmpdir, "subtree")
-        slibc, stest_lib = _copy_libs([libc, test_lib], subtree)
-        st_exp_dict = get_ext_dict([liba, libb, libc, slibc])
-        st_exp_dict.update(
-            {
-                rp_liba: {
-                    rp_libb: "liba.dylib",
-                    rp_libc: "liba.dylib",
-                    realpath(slibc): "liba.dylib",
-                },
-                rp_libb: {
-                    rp_libc: "libb.dylib",
-                    realpath(slibc): "libb.dylib",
-                },
-            }
-        )
-        assert (
-            tree_libs_from_directory(tmpdir, lib_filt_func=filt) == st_exp_dict
-        )
-        # Change an install name, check this is ignored
-        set_install_name(slibc, "liba.dylib", "newlib")
-        inc_exp_dict = get_ext_dict([liba, libb, libc, slibc])
-        inc_exp_dict.update(
-            {
-                rp_liba: {rp_libb: "liba.dylib", rp_libc: "liba.dylib"},
-                rp_libb: {
-                    rp_libc: "libb.dylib",
-                    realpath(slibc): "libb.dylib",
-                },
-            }
-        )
-        assert (
-            tree_libs_from_directory(
-                tmpdir, lib_filt_func=filt, ignore_missing=True
-            )
-            == inc_exp_dict
-        )
-        # Symlink a depending canonical lib - should have no effect because of
-        # the canonical names
-        os.symlink(liba, pjoin(dirname(liba), "funny.dylib"))
-        assert (
-            tree_libs_from_directory(
-                tmpdir, lib_filt_func=filt, ignore_missing=True
-            )
-            == inc_exp_dict
+    tmpdir = str(tmp_path)
+    monkeypatch.chdir(tmpdir)  # Bare install names resolve from here
+    local_libs = _copy_libs(to_copy, tmpdir)
+    rp_local_libs = [realpath(L) for L in local_libs]
+    liba, libb, libc, test_lib = local_libs
+    rp_liba, rp_libb, rp_libc, rp_test_lib = rp_local_libs
+    exp_dict = get_ext_dict(local_libs)
+    exp_dict.update(
+        {
+            rp_liba: {rp_libb: "liba.dylib", rp_libc: "liba.dylib"},
+            rp_libb: {rp_libc: "libb.dylib"},
+            rp_libc: {rp_test_lib: "libc.dylib"},
+        }
+    )
+    # default - no filtering
+    assert tree_libs_from_directory(tmpdir) == exp_dict
+
+    def filt(fname: str) -> bool:
+        return filter_system_libs(fname) and fname.endswith(".dylib")
+
+    exp_dict = get_ext_dict([liba, libb, libc])
+    exp_dict.update(
+        {
+            rp_liba: {rp_libb: "liba.dylib", rp_libc: "liba.dylib"},
+            rp_libb: {rp_libc: "libb.dylib"},
+        }
+    )
+    # filtering
+    assert tree_libs_from_directory(tmpdir, lib_filt_func=filt) == exp_dict
+    # Copy some libraries into subtree to test tree walking
+    subtree = pjoin(tmpdir, "subtree")
+    slibc, stest_lib = _copy_libs([libc, test_lib], subtree)
+    st_exp_dict = get_ext_dict([liba, libb, libc, slibc])
+    st_exp_dict.update(
+        {
+            rp_liba: {
+                rp_libb: "liba.dylib",
+                rp_libc: "liba.dylib",
+                realpath(slibc): "liba.dylib",
+            },
+            rp_libb: {
+                rp_libc: "libb.dylib",
+                realpath(slibc): "libb.dylib",
+            },
+        }
+    )
+    assert tree_libs_from_directory(tmpdir, lib_filt_func=filt) == st_exp_dict
+    # Change an install name, check this is ignored
+    set_install_name(slibc, "liba.dylib", "newlib")
+    inc_exp_dict = get_ext_dict([liba, libb, libc, slibc])
+    inc_exp_dict.update(
+        {
+            rp_liba: {rp_libb: "liba.dylib", rp_libc: "liba.dylib"},
+            rp_libb: {
+                rp_libc: "libb.dylib",
+                realpath(slibc): "libb.dylib",
+            },
+        }
+    )
+    assert (
+        tree_libs_from_directory(
+            tmpdir, lib_filt_func=filt, ignore_missing=True
         )
-        # Symlink a depended lib.  Now 'newlib' is a symlink to liba, and the
-        # dependency of slibc on newlib appears as a dependency on liba, but
-        # with install name 'newlib'
-        os.symlink(liba, "newlib")
-        sl_exp_dict = get_ext_dict([liba, libb, libc, slibc])
-        sl_exp_dict.update(
-            {
-                rp_liba: {
-                    rp_libb: "liba.dylib",
-                    rp_libc: "liba.dylib",
-                    realpath(slibc): "newlib",
-                },
-                rp_libb: {
-                    rp_libc: "libb.dylib",
-                    realpath(slibc): "libb.dylib",
-                },
-            }
+        == inc_exp_dict
+    )
+    # Symlink a depending canonical lib - should have no effect because of
+    # the canonical names
+    os.symlink(liba, pjoin(dirname(liba), "funny.dylib"))
+    assert (
+        tree_libs_from_directory(
+            tmpdir, lib_filt_func=filt, ignore_missing=True
         )
-        assert (
-            tree_libs_from_directory(
-                tmpdir, lib_filt_func=filt, ignore_missing=True
-            )
-            == sl_exp_dict
+        == inc_exp_dict
+    )
+    # Symlink a depended lib.  Now 'newlib' is a symlink to liba, and the
+    # dependency of slibc on newlib appears as a dependency on liba, but
+    # with install name 'newlib'
+    os.symlink(liba, "newlib")
+    sl_exp_dict = get_ext_dict([liba, libb, libc, slibc])
+    sl_exp_dict.update(
+        {
+            rp_liba: {
+                rp_libb: "liba.dylib",
+                rp_libc: "liba.dylib",
+                realpath(slibc): "newlib",
+            },
+            rp_libb: {
+                rp_libc: "libb.dylib",
+                realpath(slibc): "libb.dylib",
+            },
+        }
+    )
+    assert (
+        tree_libs_from_directory(
+            tmpdir, lib_filt_func=filt, ignore_missing=True
         )
+        == sl_exp_dict
+    )
 
 
 @pytest.mark.xfail(
     sys.platform == "win32", reason="Uses symlinks.", strict=False
 )
 @pytest.mark.xfail(sys.platform != "darwin", reason="install_name_tool")
-def test_tree_libs_from_directory_with_links() -> None:
+def test_tree_libs_from_directory_with_links(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
     # Test ability to walk through tree, where the same library may have
     # soft links under different subdirectories. See also GH#133, where
     # we have:
@@ -278,74 +280,69 @@ def test_tree_libs_from_directory_with_links() -> None:
         LIBA,
         LIBB,
     ]
-    with InTemporaryDirectory() as tmpdir:
-        local_libs = _copy_libs(to_copy, tmpdir)
-        rp_local_libs = [realpath(L) for L in local_libs]
-        (
-            liba,
+    tmpdir = str(tmp_path)
+    monkeypatch.chdir(tmpdir)  # Bare install names resolve from here
+    local_libs = _copy_libs(to_copy, tmpdir)
+    rp_local_libs = [realpath(L) for L in local_libs]
+    (
+        liba,
+        libb,
+    ) = local_libs
+    (
+        rp_liba,
+        rp_libb,
+    ) = rp_local_libs
+
+    # copy files
+    os.makedirs(pjoin(tmpdir, "links"))
+    liba_link = pjoin(tmpdir, "links", "liba.dylib")
+    libb_use_link = pjoin(tmpdir, "links", "libb.dylib")
+    rp_libb_use_link = realpath(libb_use_link)
+    os.symlink(liba, liba_link)
+    shutil.copyfile(libb, libb_use_link)
+
+    # hack links/libb.dylib to depend on the softlink of liba.dylib
+    subprocess.check_call(
+        [
+            "install_name_tool",
+            "-change",
+            "liba.dylib",
+            liba_link,
+            libb_use_link,
+        ]
+    )
+    # hack libb.dylib to resolve from rpath, bypass searching from env
+    subprocess.check_call(
+        [
+            "install_name_tool",
+            "-change",
+            "liba.dylib",
+            "@rpath/liba.dylib",
+            "-add_rpath",
+            os.path.dirname(liba),
             libb,
-        ) = local_libs
-        (
-            rp_liba,
-            rp_libb,
-        ) = rp_local_libs
-
-        # copy files
-        os.makedirs(pjoin(tmpdir, "links"))
-        liba_link = pjoin(tmpdir, "links", "liba.dylib")
-        libb_use_link = pjoin(tmpdir, "links", "libb.dylib")
-        rp_libb_use_link = realpath(libb_use_link)
-        os.symlink(liba, liba_link)
-        shutil.copy2(libb, libb_use_link)
-
-        # hack links/libb.dylib to depend on the softlink of liba.dylib
-        subprocess.check_call(
-            [
-                "install_name_tool",
-                "-change",
-                "liba.dylib",
-                liba_link,
-                libb_use_link,
-            ]
-        )
-        # hack libb.dylib to resolve from rpath, bypass searching from env
-        subprocess.check_call(
-            [
-                "install_name_tool",
-                "-change",
-                "liba.dylib",
-                "@rpath/liba.dylib",
-                libb,
-            ]
-        )
-        subprocess.check_call(
-            [
-                "install_name_tool",
-                "-add_rpath",
-                os.path.dirname(liba),
-                libb,
-            ]
-        )
+        ]
+    )
 
-        exp_dict = get_ext_dict(local_libs + [liba_link, libb_use_link])
-        exp_dict.update(
-            {
-                rp_liba: {
-                    rp_libb: "@rpath/liba.dylib",
-                    rp_libb_use_link: liba_link,
-                },
-            }
-        )
+    exp_dict = get_ext_dict(local_libs + [liba_link, libb_use_link])
+    exp_dict.update(
+        {
+            rp_liba: {
+                rp_libb: "@rpath/liba.dylib",
+                rp_libb_use_link: liba_link,
+            },
+        }
+    )
 
-        # Put dir of soft link for `liba.dylib` into `DYLD_LIBRARY_PATH`
-        with TempDirWithoutEnvVars("DYLD_LIBRARY_PATH"):
-            # the result should be correct normally
-            assert tree_libs_from_directory(tmpdir) == exp_dict
+    # Clear `DYLD_LIBRARY_PATH` first; the result should be correct normally
+    monkeypatch.delenv("DYLD_LIBRARY_PATH", raising=False)
+    assert tree_libs_from_directory(tmpdir) == exp_dict
 
-            # the result should be correct even if there are soft links in
-            # `$DYLD_LIBRARY_PATH`
-            os.environ["DYLD_LIBRARY_PATH"] = os.path.dirname(liba_link)
-            assert tree_libs_from_directory(tmpdir) == exp_dict
+    # Put dir of soft link for `liba.dylib` into `DYLD_LIBRARY_PATH`; the
+    # result should be correct even if there are soft links in
+    # `$DYLD_LIBRARY_PATH`
+    monkeypatch.setenv("DYLD_LIBRARY_PATH", os.path.dirname(liba_link))
+    assert tree_libs_from_directory(tmpdir) == exp_dict
 
 
 def test_get_prefix_stripper() -> None:
@@ -374,68 +371,67 @@ def test_get_rp_stripper() -> None:
 def get_ext_dict_stripped(
     local_libs: Iterable[str], start_path: str
 ) -> dict[str, dict[str, str]]:
-    ext_dict = {}
-    for ext_lib in EXT_LIBS:
-        lib_deps = {}
-        for local_lib in local_libs:
-            dep_path = relpath(local_lib, start_path)
-            if dep_path.startswith("./"):
-                dep_path = dep_path[2:]
-            lib_deps[dep_path] = ext_lib
-        ext_dict[realpath(ext_lib)] = lib_deps
-    return ext_dict
+    dep_paths = []
+    for local_lib in local_libs:
+        dep_path = relpath(local_lib, start_path)
+        if dep_path.startswith("./"):
+            dep_path = dep_path[2:]
+        dep_paths.append(dep_path)
+    return {
+        rp_ext_lib: dict.fromkeys(dep_paths, ext_lib)
+        for rp_ext_lib, ext_lib in resolved_ext_libs()
+    }
 
 
 @pytest.mark.xfail(sys.platform != "darwin", reason="otool")
-def test_stripped_lib_dict() -> None:
+def test_stripped_lib_dict(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
     # Test routine to return lib_dict with relative paths
     to_copy = [LIBA, LIBB, LIBC, TEST_LIB]
-    with InTemporaryDirectory() as tmpdir:
-        local_libs = _copy_libs(to_copy, tmpdir)
-        exp_dict = get_ext_dict_stripped(local_libs, tmpdir)
-        exp_dict.update(
-            {
-                "liba.dylib": {
-                    "libb.dylib": "liba.dylib",
-                    "libc.dylib": "liba.dylib",
-                },
-                "libb.dylib": {"libc.dylib": "libb.dylib"},
-                "libc.dylib": {"test-lib": "libc.dylib"},
-            }
-        )
-        my_path = realpath(tmpdir) + os.path.sep
-        assert (
-            stripped_lib_dict(tree_libs_from_directory(tmpdir), my_path)
-            == exp_dict
-        )
-        # Copy some libraries into subtree to test tree walking
-        subtree = pjoin(tmpdir, "subtree")
-        liba, libb, libc, test_lib = local_libs
-        slibc, stest_lib = _copy_libs([libc, test_lib], subtree)
-        exp_dict = get_ext_dict_stripped(
-            local_libs + [slibc, stest_lib], tmpdir
-        )
-        exp_dict.update(
-            {
-                "liba.dylib": {
-                    "libb.dylib": "liba.dylib",
-                    "libc.dylib": "liba.dylib",
-                    "subtree/libc.dylib": "liba.dylib",
-                },
-                "libb.dylib": {
-                    "libc.dylib": "libb.dylib",
-                    "subtree/libc.dylib": "libb.dylib",
-                },
-                "libc.dylib": {
-                    "test-lib": "libc.dylib",
-                    "subtree/test-lib": "libc.dylib",
-                },
-            }
-        )
-        assert (
-            stripped_lib_dict(tree_libs_from_directory(tmpdir), my_path)
-            == exp_dict
-        )
+    tmpdir = str(tmp_path)
+    monkeypatch.chdir(tmpdir)  # Bare install names resolve from here
+    local_libs = _copy_libs(to_copy, tmpdir)
+    exp_dict = get_ext_dict_stripped(local_libs, tmpdir)
+    exp_dict.update(
+        {
+            "liba.dylib": {
+                "libb.dylib": "liba.dylib",
+                "libc.dylib": "liba.dylib",
+            },
+            "libb.dylib": {"libc.dylib": "libb.dylib"},
+            "libc.dylib": {"test-lib": "libc.dylib"},
+        }
+    )
+    my_path = realpath(tmpdir) + os.path.sep
+    assert (
+        stripped_lib_dict(tree_libs_from_directory(tmpdir), my_path) == exp_dict
+    )
+    # Copy some libraries into subtree to test tree walking
+    subtree = pjoin(tmpdir, "subtree")
+    liba, libb, libc, test_lib = local_libs
+    slibc, stest_lib = _copy_libs([libc, test_lib], subtree)
+    exp_dict = get_ext_dict_stripped(local_libs + [slibc, stest_lib], tmpdir)
+    exp_dict.update(
+        {
+            "liba.dylib": {
+                "libb.dylib": "liba.dylib",
+                "libc.dylib": "liba.dylib",
+                "subtree/libc.dylib": "liba.dylib",
+            },
+            "libb.dylib": {
+                "libc.dylib": "libb.dylib",
+                "subtree/libc.dylib": "libb.dylib",
+            },
+            "libc.dylib": {
+                "test-lib": "libc.dylib",
+                "subtree/test-lib": "libc.dylib",
+            },
+        }
+    )
+    assert (
+        stripped_lib_dict(tree_libs_from_directory(tmpdir), my_path) == exp_dict
+    )
 
 
 @pytest.mark.xfail(sys.platform != "darwin", reason="wheel_libs")
@@ -459,15 +455,15 @@ def test_wheel_libs(plat_wheel: PlatWheel) -> None:
 
 
 @pytest.mark.xfail(sys.platform != "darwin", reason="otool")
-def test_wheel_libs_ignore_missing() -> None:
+def test_wheel_libs_ignore_missing(tmp_path: Path) -> None:
     # Test wheel_libs ignore_missing parameter.
-    with InTemporaryDirectory() as tmpdir:
-        shutil.copy(RPATH_WHEEL, pjoin(tmpdir, "rpath.whl"))
-        with pytest.raises(
-            DelocationError, match=r"Could not find all dependencies."
-        ):
-            wheel_libs("rpath.whl")
-        wheel_libs("rpath.whl", ignore_missing=True)
+    rpath_whl = str(tmp_path / "rpath.whl")
+    shutil.copy(RPATH_WHEEL, rpath_whl)
+    with pytest.raises(
+        DelocationError, match=r"Could not find all dependencies."
+    ):
+        wheel_libs(rpath_whl)
+    wheel_libs(rpath_whl, ignore_missing=True)
 
 
 @pytest.mark.xfail(sys.platform == "win32", reason="Needs Unix linkage.")
@@ -13,6 +13,8 @@ import os
 import shutil
 import subprocess
 import sys
+import zipfile
+from collections.abc import Callable
 from os.path import basename, exists, realpath, splitext
 from os.path import join as pjoin
 from pathlib import Path
@@ -21,12 +23,17 @@ import pytest
 from pytest_console_scripts import ScriptRunner
 
 from ..cmd.common import delocate_parser
-from ..tmpdirs import InGivenDirectory, InTemporaryDirectory
+from ..tmpdirs import InGivenDirectory
 from ..tools import dir2zip, get_rpaths, set_install_name, zip2dir
 from ..wheeltools import InWheel
-from .test_delocating import _copy_to, _make_bare_depends, _make_libtree
+from .file_tools import link_or_copy
+from .test_delocating import (
+    _copy_to,
+    _make_bare_depends,
+    _make_libtree,
+)
 from .test_fuse import assert_same_tree
-from .test_install_names import EXT_LIBS
+from .test_install_names import EXT_LIBS, resolved_ext_libs
 from .test_wheelies import (
     PLAT_WHEEL,
     PURE_WHEEL,
@@ -63,14 +70,18 @@ def _proc_lines(in_str: str) -> list[str]:
         List of line ``str`` where each line has been stripped of leading and
         trailing whitespace and empty lines have been removed.
     """
-    lines = in_str.splitlines()
-    return [line.strip() for line in lines if line.strip() != ""]
+    return [line for line in map(str.strip, in_str.splitlines()) if line]
 
 
 @pytest.mark.xfail(  # type: ignore[misc]
     sys.platform != "darwin", reason="Needs macOS linkage."
 )
-def test_listdeps(plat_wheel: PlatWheel, script_runner: ScriptRunner) -> None:
+def test_listdeps(
+    plat_wheel: PlatWheel,
+    script_runner: ScriptRunner,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
     # smokey tests of list dependencies command
     local_libs = {
         "liba.dylib",
@@ -85,39 +96,39 @@ def test_listdeps(plat_wheel: PlatWheel, script_runner: ScriptRunner) -> None:
         )
     assert set(_proc_lines(result.stdout)) == local_libs
     # single path, no libs
-    with InTemporaryDirectory():
-        zip2dir(PURE_WHEEL, "pure")
-        result = script_runner.run(["delocate-listdeps", "pure"], check=True)
-        assert result.stdout.strip() == ""
+    monkeypatch.chdir(tmp_path)
+    zip2dir(PURE_WHEEL, "pure")
+    result = script_runner.run(["delocate-listdeps", "pure"], check=True)
+    assert result.stdout.strip() == ""
 
-        # Multiple paths one with libs
-        zip2dir(plat_wheel.whl, "plat")
-        result = script_runner.run(
-            ["delocate-listdeps", "pure", "plat"], check=True
-        )
-        assert _proc_lines(result.stdout) == [
-            "pure:",
-            "plat:",
-            plat_wheel.stray_lib,
-        ]
+    # Multiple paths one with libs
+    zip2dir(plat_wheel.whl, "plat")
+    result = script_runner.run(
+        ["delocate-listdeps", "pure", "plat"], check=True
+    )
+    assert _proc_lines(result.stdout) == [
+        "pure:",
+        "plat:",
+        plat_wheel.stray_lib,
+    ]
 
-        # With -d flag, get list of dependending modules
-        result = script_runner.run(
-            ["delocate-listdeps", "-d", "pure", "plat"], check=True
-        )
-        assert _proc_lines(result.stdout) == [
-            "pure:",
-            "plat:",
-            plat_wheel.stray_lib + ":",
-            str(Path("plat", "fakepkg1", "subpkg", "module2.abi3.so")),
-        ]
+    # With -d flag, get list of dependending modules
+    result = script_runner.run(
+        ["delocate-listdeps", "-d", "pure", "plat"], check=True
+    )
+    assert _proc_lines(result.stdout) == [
+        "pure:",
+        "plat:",
+        plat_wheel.stray_lib + ":",
+        str(Path("plat", "fakepkg1", "subpkg", "module2.abi3.so")),
+    ]
 
     # With --all flag, get all dependencies
     with InGivenDirectory(DATA_PATH):
         result = script_runner.run(
             ["delocate-listdeps", "--all", DATA_PATH], check=True
         )
-    rp_ext_libs = set(realpath(L) for L in EXT_LIBS)
+    rp_ext_libs = {rp_ext_lib for rp_ext_lib, _ in resolved_ext_libs()}
     assert set(_proc_lines(result.stdout)) == local_libs | rp_ext_libs
 
     # Works on wheels as well
@@ -170,131 +181,162 @@ def test_listdeps(plat_wheel: PlatWheel, script_runner: ScriptRunner) -> None:
 @pytest.mark.xfail(  # type: ignore[misc]
     sys.platform != "darwin", reason="Runs macOS executable."
 )
-def test_path(script_runner: ScriptRunner) -> None:
+def test_path(
+    script_runner: ScriptRunner,
+    libtree_template: str,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
     # Test path cleaning
-    with InTemporaryDirectory():
-        # Make a tree; use realpath for OSX /private/var - /var
-        liba, _, _, test_lib, slibc, stest_lib = _make_libtree(
-            realpath("subtree")
-        )
-        os.makedirs("fakelibs")
-        # Make a fake external library to link to
-        fake_lib = realpath(_copy_to(liba, "fakelibs", "libfake.dylib"))
-        _, _, _, test_lib, slibc, stest_lib = _make_libtree(
-            realpath("subtree2")
-        )
-        subprocess.run([test_lib], check=True)
-        subprocess.run([stest_lib], check=True)
-        set_install_name(slibc, EXT_LIBS[0], fake_lib)
-        # Check it fixes up correctly
-        script_runner.run(
-            ["delocate-path", "subtree", "subtree2", "-L", "deplibs"],
-            check=True,
-        )
-        assert len(os.listdir(Path("subtree", "deplibs"))) == 0
-        # Check fake libary gets copied and delocated
-        out_path = Path("subtree2", "deplibs")
-        assert os.listdir(out_path) == ["libfake.dylib"]
+    monkeypatch.chdir(tmp_path)
+    # Make a tree; use realpath for OSX /private/var - /var
+    liba, _, _, test_lib, slibc, stest_lib = _make_libtree(
+        realpath("subtree"), libtree_template
+    )
+    os.makedirs("fakelibs")
+    # Make a fake external library to link to
+    fake_lib = realpath(_copy_to(liba, "fakelibs", "libfake.dylib"))
+    _, _, _, test_lib, slibc, stest_lib = _make_libtree(
+        realpath("subtree2"), libtree_template
+    )
+    set_install_name(slibc, EXT_LIBS[0], fake_lib)
+    # Check it fixes up correctly
+    script_runner.run(
+        ["delocate-path", "subtree", "subtree2", "-L", "deplibs"],
+        check=True,
+    )
+    assert len(os.listdir(Path("subtree", "deplibs"))) == 0
+    # Check fake libary gets copied and delocated
+    out_path = Path("subtree2", "deplibs")
+    assert os.listdir(out_path) == ["libfake.dylib"]
 
 
 @pytest.mark.xfail(  # type: ignore[misc]
     sys.platform != "darwin", reason="Needs macOS linkage."
 )
-def test_path_dylibs(script_runner: ScriptRunner) -> None:
+def test_path_dylibs(
+    script_runner: ScriptRunner, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
     # Test delocate-path with and without dylib extensions
-    with InTemporaryDirectory():
-        # With 'dylibs-only' - does not inspect non-dylib files
-        liba, bare_b = _make_bare_depends()
-        out_dypath = Path("subtree", "deplibs")
-        script_runner.run(
-            ["delocate-path", "subtree", "-L", "deplibs", "-d"], check=True
-        )
-        assert len(os.listdir(out_dypath)) == 0
-        script_runner.run(
-            ["delocate-path", "subtree", "-L", "deplibs", "--dylibs-only"],
-            check=True,
-        )
-        assert len(os.listdir(Path("subtree", "deplibs"))) == 0
-        # Default - does inspect non-dylib files
-        script_runner.run(
-            ["delocate-path", "subtree", "-L", "deplibs"], check=True
-        )
-        assert os.listdir(out_dypath) == ["liba.dylib"]
+    monkeypatch.chdir(tmp_path)
+    # With 'dylibs-only' - does not inspect non-dylib files
+    liba, bare_b = _make_bare_depends()
+    out_dypath = Path("subtree", "deplibs")
+    script_runner.run(
+        ["delocate-path", "subtree", "-L", "deplibs", "-d"], check=True
+    )
+    assert len(os.listdir(out_dypath)) == 0
+    script_runner.run(
+        ["delocate-path", "subtree", "-L", "deplibs", "--dylibs-only"],
+        check=True,
+    )
+    assert len(os.listdir(Path("subtree", "deplibs"))) == 0
+    # Default - does inspect non-dylib files
+    script_runner.run(["delocate-path", "subtree", "-L", "deplibs"], check=True)
+    assert os.listdir(out_dypath) == ["liba.dylib"]
 
 
 def _check_wheel(wheel_fname: str | Path, lib_sdir: str | Path) -> None:
-    wheel_fname = Path(wheel_fname).resolve(strict=True)
-    with InTemporaryDirectory():
-        zip2dir(str(wheel_fname), "plat_pkg")
-        dylibs = Path("plat_pkg", "fakepkg1", lib_sdir)
-        assert dylibs.exists()
-        assert os.listdir(dylibs) == ["libextfunc.dylib"]
+    # Check the wheel's library directory from its listing, without unpacking
+    prefix = f"fakepkg1/{Path(lib_sdir).as_posix()}/"
+    with zipfile.ZipFile(Path(wheel_fname).resolve(strict=True)) as wheel:
+        contents = {
+            name[len(prefix) :].split("/", 1)[0]
+            for name in wheel.namelist()
+            if name.startswith(prefix) and name != prefix
+        }
+    assert contents == {"libextfunc.dylib"}
+
+
+def _wheel_has_dir(wheel_fname: str | Path, subpath: str) -> bool:
+    # Check for a directory in the wheel from its listing, without unpacking
+    with zipfile.ZipFile(wheel_fname) as wheel:
+        return any(name.startswith(f"{subpath}/") for name in wheel.namelist())
+
+
+def _save_originals(*fnames: str) -> Callable[[], None]:
+    # Copy `fnames` aside, returning a function that restores them.  Restoring
+    # a fixed wheel and its library is cheaper than rebuilding them with
+    # `_fixed_wheel`.
+    saved = [(f"{fname}.orig", fname) for fname in fnames]
+    for orig, fname in saved:
+        shutil.copyfile(fname, orig)
+
+    def restore() -> None:
+        for orig, fname in saved:
+            shutil.copyfile(orig, fname)
+
+    return restore
 
 
 @pytest.mark.xfail(  # type: ignore[misc]
     sys.platform != "darwin", reason="Needs macOS linkage."
 )
-def test_wheel(script_runner: ScriptRunner) -> None:
+def test_wheel(
+    script_runner: ScriptRunner, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
     # Some tests for wheel fixing
-    with InTemporaryDirectory() as tmpdir:
-        # Default in-place fix
-        fixed_wheel, stray_lib = _fixed_wheel(tmpdir)
-        script_runner.run(["delocate-wheel", fixed_wheel], check=True)
-        _check_wheel(fixed_wheel, ".dylibs")
-        # Make another copy to test another output directory
-        fixed_wheel, stray_lib = _fixed_wheel(tmpdir)
-        script_runner.run(
-            ["delocate-wheel", "-L", "dynlibs_dir", fixed_wheel], check=True
-        )
-        _check_wheel(fixed_wheel, "dynlibs_dir")
-        # Another output directory
-        fixed_wheel, stray_lib = _fixed_wheel(tmpdir)
-        script_runner.run(
-            ["delocate-wheel", "-w", "fixed", fixed_wheel], check=True
-        )
-        _check_wheel(Path("fixed", basename(fixed_wheel)), ".dylibs")
-        # More than one wheel
-        copy_name = "fakepkg1_copy-1.0-cp36-abi3-macosx_10_9_universal2.whl"
-        shutil.copy2(fixed_wheel, copy_name)
-        result = script_runner.run(
-            ["delocate-wheel", "-w", "fixed2", fixed_wheel, copy_name],
-            check=True,
-        )
-        assert _proc_lines(result.stdout) == [
-            "Fixing: " + name for name in (fixed_wheel, copy_name)
-        ]
-        _check_wheel(Path("fixed2", basename(fixed_wheel)), ".dylibs")
-        _check_wheel(Path("fixed2", copy_name), ".dylibs")
+    tmpdir = str(tmp_path)
+    monkeypatch.chdir(tmpdir)
+    # Default in-place fix
+    fixed_wheel, stray_lib = _fixed_wheel(tmpdir)
+    restore = _save_originals(fixed_wheel)
+    script_runner.run(["delocate-wheel", fixed_wheel], check=True)
+    _check_wheel(fixed_wheel, ".dylibs")
+    # Make another copy to test another output directory
+    restore()
+    script_runner.run(
+        ["delocate-wheel", "-L", "dynlibs_dir", fixed_wheel], check=True
+    )
+    _check_wheel(fixed_wheel, "dynlibs_dir")
+    # Another output directory
+    restore()
+    script_runner.run(
+        ["delocate-wheel", "-w", "fixed", fixed_wheel], check=True
+    )
+    _check_wheel(Path("fixed", basename(fixed_wheel)), ".dylibs")
+    # More than one wheel
+    copy_name = "fakepkg1_copy-1.0-cp36-abi3-macosx_10_9_universal2.whl"
+    link_or_copy(fixed_wheel, copy_name)  # Inputs are only read
+    result = script_runner.run(
+        ["delocate-wheel", "-w", "fixed2", fixed_wheel, copy_name],
+        check=True,
+    )
+    assert _proc_lines(result.stdout) == [
+        "Fixing: " + name for name in (fixed_wheel, copy_name)
+    ]
+    _check_wheel(Path("fixed2", basename(fixed_wheel)), ".dylibs")
+    _check_wheel(Path("fixed2", copy_name), ".dylibs")
 
-        # Verbose - single wheel
-        result = script_runner.run(
-            ["delocate-wheel", "-w", "fixed3", fixed_wheel, "-v"], check=True
-        )
-        _check_wheel(Path("fixed3", basename(fixed_wheel)), ".dylibs")
-        wheel_lines1 = [
-            "Fixing: " + fixed_wheel,
-            "Copied to package .dylibs directory:",
-            stray_lib,
-        ]
-        assert _proc_lines(result.stdout) == wheel_lines1
+    # Verbose - single wheel
+    result = script_runner.run(
+        ["delocate-wheel", "-w", "fixed3", fixed_wheel, "-v"], check=True
+    )
+    _check_wheel(Path("fixed3", basename(fixed_wheel)), ".dylibs")
+    wheel_lines1 = [
+        "Fixing: " + fixed_wheel,
+        "Copied to package .dylibs directory:",
+        stray_lib,
+    ]
+    assert _proc_lines(result.stdout) == wheel_lines1
 
-        result = script_runner.run(
-            [
-                "delocate-wheel",
-                "-v",
-                "--wheel-dir",
-                "fixed4",
-                fixed_wheel,
-                copy_name,
-            ],
-            check=True,
-        )
-        wheel_lines2 = [
-            f"Fixing: {copy_name}",
-            "Copied to package .dylibs directory:",
-            stray_lib,
-        ]
-        assert _proc_lines(result.stdout) == wheel_lines1 + wheel_lines2
+    result = script_runner.run(
+        [
+            "delocate-wheel",
+            "-v",
+            "--wheel-dir",
+            "fixed4",
+            fixed_wheel,
+            copy_name,
+        ],
+        check=True,
+    )
+    wheel_lines2 = [
+        f"Fixing: {copy_name}",
+        "Copied to package .dylibs directory:",
+        stray_lib,
+    ]
+    assert _proc_lines(result.stdout) == wheel_lines1 + wheel_lines2
 
 
 @pytest.mark.xfail(  # type: ignore[misc]
@@ -316,275 +358,278 @@ def test_fix_wheel_dylibs(script_runner: ScriptRunner, tmp_path: Path) -> None:
     _check_wheel(test1_name, ".dylibs")
     # Can turn this off to only look in dynamic lib exts
     script_runner.run(["delocate-wheel", test2_name, "-d"], check=True)
-    with InWheel(test2_name):  # No fix
-        assert not Path("fakepkg1", ".dylibs").exists()
+    assert not _wheel_has_dir(test2_name, "fakepkg1/.dylibs")  # No fix
 
 
 @pytest.mark.xfail(  # type: ignore[misc]
     sys.platform != "darwin", reason="Needs macOS linkage."
 )
-def test_fix_wheel_archs(script_runner: ScriptRunner) -> None:
-    # Some tests for wheel fixing
-    with InTemporaryDirectory() as tmpdir:
-        # Test check of architectures
-        fixed_wheel, stray_lib = _fixed_wheel(tmpdir)
-        # Fixed wheel, architectures are OK
-        script_runner.run(["delocate-wheel", fixed_wheel, "-k"], check=True)
-        _check_wheel(fixed_wheel, ".dylibs")
-        # Broken with one architecture removed
-        archs = set(("x86_64", "arm64"))
-
-        def _fix_break(arch: str) -> None:
-            _fixed_wheel(tmpdir)
-            _thin_lib(stray_lib, arch)
-
-        def _fix_break_fix(arch: str) -> None:
-            _fixed_wheel(tmpdir)
-            _thin_lib(stray_lib, arch)
-            _thin_mod(fixed_wheel, arch)
-
-        for arch in archs:
-            # Not checked
-            _fix_break(arch)
-            script_runner.run(["delocate-wheel", fixed_wheel], check=True)
-            _check_wheel(fixed_wheel, ".dylibs")
-            # Checked
-            _fix_break(arch)
-            result = script_runner.run(
-                ["delocate-wheel", fixed_wheel, "--check-archs"]
-            )
-            assert result.returncode != 0
-            assert result.stderr.startswith("Traceback")
-            assert (
-                "DelocationError: Some missing architectures in wheel"
-                in result.stderr
-            )
-            assert result.stdout.strip() == ""
-            # Checked, verbose
-            _fix_break(arch)
-            result = script_runner.run(
-                ["delocate-wheel", fixed_wheel, "--check-archs", "-v"]
-            )
-            assert result.returncode != 0
-            assert "Traceback" in result.stderr
-            assert result.stderr.endswith(
-                "DelocationError: Some missing architectures in wheel"
-                f"\n{'fakepkg1/subpkg/module2.abi3.so'}"
-                f" needs arch {archs.difference([arch]).pop()}"
-                f" missing from {stray_lib}\n"
-            )
-            assert result.stdout == f"Fixing: {fixed_wheel}\n"
-            # Require particular architectures
-        both_archs = "arm64,x86_64"
-        for ok in ("universal2", "arm64", "x86_64", both_archs):
-            _fixed_wheel(tmpdir)
-            script_runner.run(
-                ["delocate-wheel", fixed_wheel, "--require-archs=" + ok],
-                check=True,
-            )
-        for arch in archs:
-            other_arch = archs.difference([arch]).pop()
-            for not_ok in ("intel", both_archs, other_arch):
-                _fix_break_fix(arch)
-                result = script_runner.run(
-                    [
-                        "delocate-wheel",
-                        fixed_wheel,
-                        "--require-archs=" + not_ok,
-                    ],
-                )
-                assert result.returncode != 0
+def test_fix_wheel_archs(script_runner: ScriptRunner, tmp_path: Path) -> None:
+    # Check wheels with all the required architectures
+    fixed_wheel, _ = _fixed_wheel(tmp_path)
+    restore = _save_originals(fixed_wheel)
+    # Fixed wheel, architectures are OK
+    script_runner.run(["delocate-wheel", fixed_wheel, "-k"], check=True)
+    _check_wheel(fixed_wheel, ".dylibs")
+    # Require particular architectures
+    for ok in ("universal2", "arm64", "x86_64", "arm64,x86_64"):
+        restore()
+        script_runner.run(
+            ["delocate-wheel", fixed_wheel, "--require-archs=" + ok],
+            check=True,
+        )
+
+
+@pytest.mark.xfail(  # type: ignore[misc]
+    sys.platform != "darwin", reason="Needs macOS linkage."
+)
+@pytest.mark.parametrize("arch", ["x86_64", "arm64"])
+def test_fix_wheel_archs_missing(
+    script_runner: ScriptRunner, tmp_path: Path, arch: str
+) -> None:
+    # Check wheels broken with one architecture removed
+    fixed_wheel, stray_lib = _fixed_wheel(tmp_path)
+    restore = _save_originals(fixed_wheel, stray_lib)
+    other_arch = ({"x86_64", "arm64"} - {arch}).pop()
+
+    def _fix_break() -> None:
+        restore()
+        _thin_lib(stray_lib, arch)
+
+    def _fix_break_fix() -> None:
+        restore()
+        _thin_lib(stray_lib, arch)
+        _thin_mod(fixed_wheel, arch)
+
+    # Not checked
+    _fix_break()
+    script_runner.run(["delocate-wheel", fixed_wheel], check=True)
+    _check_wheel(fixed_wheel, ".dylibs")
+    # Checked
+    _fix_break()
+    result = script_runner.run(["delocate-wheel", fixed_wheel, "--check-archs"])
+    assert result.returncode != 0
+    assert result.stderr.startswith("Traceback")
+    assert (
+        "DelocationError: Some missing architectures in wheel" in result.stderr
+    )
+    assert result.stdout.strip() == ""
+    # Checked, verbose
+    _fix_break()
+    result = script_runner.run(
+        ["delocate-wheel", fixed_wheel, "--check-archs", "-v"]
+    )
+    assert result.returncode != 0
+    assert "Traceback" in result.stderr
+    assert result.stderr.endswith(
+        "DelocationError: Some missing architectures in wheel"
+        f"\n{'fakepkg1/subpkg/module2.abi3.so'}"
+        f" needs arch {other_arch}"
+        f" missing from {stray_lib}\n"
+    )
+    assert result.stdout == f"Fixing: {fixed_wheel}\n"
+    # Require architectures the broken wheel does not have
+    for not_ok in ("intel", "arm64,x86_64", other_arch):
+        _fix_break_fix()
+        result = script_runner.run(
+            ["delocate-wheel", fixed_wheel, "--require-archs=" + not_ok]
+        )
+        assert result.returncode != 0
 
 
 @pytest.mark.xfail(  # type: ignore[misc]
     sys.platform == "win32", reason="Can't run scripts."
 )
-def test_fuse_wheels(script_runner: ScriptRunner) -> None:
+def test_fuse_wheels(
+    script_runner: ScriptRunner, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
     # Some tests for wheel fusing
-    with InTemporaryDirectory():
-        # Wheels need proper wheel filename for delocate-merge
-        to_wheel = "to_" + basename(PLAT_WHEEL)
-        from_wheel = "from_" + basename(PLAT_WHEEL)
-        zip2dir(PLAT_WHEEL, "to_wheel")
-        zip2dir(PLAT_WHEEL, "from_wheel")
-        dir2zip("to_wheel", to_wheel)
-        dir2zip("from_wheel", from_wheel)
-        # Make sure delocate-fuse returns a non-zero exit code, it is no longer
-        # supported
-        result = script_runner.run(["delocate-fuse", to_wheel, from_wheel])
-        assert result.returncode != 0
-        script_runner.run(["delocate-merge", to_wheel, from_wheel], check=True)
-        zip2dir(to_wheel, "to_wheel_fused")
-        assert_same_tree("to_wheel_fused", "from_wheel")
-        # Test output argument
-        os.mkdir("wheels")
-        script_runner.run(
-            ["delocate-merge", to_wheel, from_wheel, "-w", "wheels"],
-            check=True,
-        )
-        zip2dir(pjoin("wheels", to_wheel), "to_wheel_refused")
-        assert_same_tree("to_wheel_refused", "from_wheel")
+    monkeypatch.chdir(tmp_path)
+    # Wheels need proper wheel filename for delocate-merge
+    to_wheel = "to_" + basename(PLAT_WHEEL)
+    from_wheel = "from_" + basename(PLAT_WHEEL)
+    shutil.copyfile(PLAT_WHEEL, to_wheel)
+    shutil.copyfile(PLAT_WHEEL, from_wheel)
+    zip2dir(PLAT_WHEEL, "from_wheel")
+    # Make sure delocate-fuse returns a non-zero exit code, it is no longer
+    # supported
+    result = script_runner.run(["delocate-fuse", to_wheel, from_wheel])
+    assert result.returncode != 0
+    script_runner.run(["delocate-merge", to_wheel, from_wheel], check=True)
+    zip2dir(to_wheel, "to_wheel_fused")
+    assert_same_tree("to_wheel_fused", "from_wheel")
+    # Test output argument
+    os.mkdir("wheels")
+    script_runner.run(
+        ["delocate-merge", to_wheel, from_wheel, "-w", "wheels"],
+        check=True,
+    )
+    zip2dir(pjoin("wheels", to_wheel), "to_wheel_refused")
+    assert_same_tree("to_wheel_refused", "from_wheel")
 
 
 @pytest.mark.xfail(  # type: ignore[misc]
     sys.platform == "win32", reason="Can't run scripts."
 )
-def test_patch_wheel(script_runner: ScriptRunner) -> None:
+def test_patch_wheel(
+    script_runner: ScriptRunner, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
     # Some tests for patching wheel
-    with InTemporaryDirectory():
-        shutil.copyfile(PURE_WHEEL, "example.whl")
-        # Default is to overwrite input
-        script_runner.run(
-            ["delocate-patch", "-v", "example.whl", WHEEL_PATCH], check=True
-        )
-        zip2dir("example.whl", "wheel1")
-        assert (
-            Path("wheel1", "fakepkg2", "__init__.py").read_text()
-            == 'print("Am in init")\n'
-        )
-        # Pass output directory
-        shutil.copyfile(PURE_WHEEL, "example.whl")
-        script_runner.run(
-            ["delocate-patch", "example.whl", WHEEL_PATCH, "-w", "wheels"],
-            check=True,
-        )
-        zip2dir(pjoin("wheels", "example.whl"), "wheel2")
-        assert (
-            Path("wheel2", "fakepkg2", "__init__.py").read_text()
-            == 'print("Am in init")\n'
-        )
-        # Bad patch fails
-        shutil.copyfile(PURE_WHEEL, "example.whl")
-        result = script_runner.run(
-            ["delocate-patch", "example.whl", WHEEL_PATCH_BAD]
-        )
-        assert result.returncode != 0
+    monkeypatch.chdir(tmp_path)
+    shutil.copyfile(PURE_WHEEL, "example.whl")
+    # Default is to overwrite input
+    script_runner.run(
+        ["delocate-patch", "-v", "example.whl", WHEEL_PATCH], check=True
+    )
+    zip2dir("example.whl", "wheel1")
+    assert (
+        Path("wheel1", "fakepkg2", "__init__.py").read_text()
+        == 'print("Am in init")\n'
+    )
+    # Pass output directory
+    shutil.copyfile(PURE_WHEEL, "example.whl")
+    script_runner.run(
+        ["delocate-patch", "example.whl", WHEEL_PATCH, "-w", "wheels"],
+        check=True,
+    )
+    zip2dir(pjoin("wheels", "example.whl"), "wheel2")
+    assert (
+        Path("wheel2", "fakepkg2", "__init__.py").read_text()
+        == 'print("Am in init")\n'
+    )
+    # Bad patch fails
+    shutil.copyfile(PURE_WHEEL, "example.whl")
+    result = script_runner.run(
+        ["delocate-patch", "example.whl", WHEEL_PATCH_BAD]
+    )
+    assert result.returncode != 0
 
 
 @pytest.mark.xfail(  # type: ignore[misc]
     sys.platform == "win32", reason="Can't run scripts."
 )
-def test_add_platforms(script_runner: ScriptRunner) -> None:
+def test_add_platforms(
+    script_runner: ScriptRunner, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
     # Check adding platform to wheel name and tag section
     assert_winfo_similar(PLAT_WHEEL, EXP_ITEMS, drop_version=False)
-    with InTemporaryDirectory() as tmpdir:
-        # First wheel needs proper wheel filename for later unpack test
-        out_fname = basename(PURE_WHEEL)
-        # Need to specify at least one platform
-        with pytest.raises(subprocess.CalledProcessError):
-            script_runner.run(
-                ["delocate-addplat", PURE_WHEEL, "-w", tmpdir], check=True
-            )
-        plat_args = ("-p", EXTRA_PLATS[0], "--plat-tag", EXTRA_PLATS[1])
-        # Can't add platforms to a pure wheel
-        with pytest.raises(subprocess.CalledProcessError):
-            script_runner.run(
-                ["delocate-addplat", PURE_WHEEL, "-w", tmpdir, *plat_args],
-                check=True,
-            )
-        assert not exists(out_fname)
-        # Error raised (as above) unless ``--skip-error`` flag set
+    tmpdir = str(tmp_path)
+    monkeypatch.chdir(tmpdir)
+    # First wheel needs proper wheel filename for later unpack test
+    out_fname = basename(PURE_WHEEL)
+    # Need to specify at least one platform
+    with pytest.raises(subprocess.CalledProcessError):
         script_runner.run(
-            ["delocate-addplat", PURE_WHEEL, "-w", tmpdir, "-k", *plat_args],
-            check=True,
-        )
-        # Still doesn't do anything though
-        assert not exists(out_fname)
-        # Works for plat_wheel
-        out_fname = ".".join(
-            (splitext(basename(PLAT_WHEEL))[0],) + EXTRA_PLATS + ("whl",)
-        )
-        script_runner.run(
-            ["delocate-addplat", PLAT_WHEEL, "-w", tmpdir, *plat_args],
-            check=True,
+            ["delocate-addplat", PURE_WHEEL, "-w", tmpdir], check=True
         )
-        assert Path(out_fname).is_file()
-        assert_winfo_similar(out_fname, EXTRA_EXPS)
-        # If wheel exists (as it does) then fail
-        with pytest.raises(subprocess.CalledProcessError):
-            script_runner.run(
-                ["delocate-addplat", PLAT_WHEEL, "-w", tmpdir, *plat_args],
-                check=True,
-            )
-        # Unless clobber is set
+    plat_args = ("-p", EXTRA_PLATS[0], "--plat-tag", EXTRA_PLATS[1])
+    # Can't add platforms to a pure wheel
+    with pytest.raises(subprocess.CalledProcessError):
         script_runner.run(
-            ["delocate-addplat", PLAT_WHEEL, "-c", "-w", tmpdir, *plat_args],
+            ["delocate-addplat", PURE_WHEEL, "-w", tmpdir, *plat_args],
             check=True,
         )
-        # Can also specify platform tags via --osx-ver flags
-        script_runner.run(
-            ["delocate-addplat", PLAT_WHEEL, "-c", "-w", tmpdir, "-x", "10_9"],
-            check=True,
-        )
-        assert_winfo_similar(out_fname, EXTRA_EXPS)
-        # Can mix plat_tag and osx_ver
-        extra_extra = ("macosx_10_12_universal2", "macosx_10_12_x86_64")
-        out_big_fname = ".".join(
-            (splitext(basename(PLAT_WHEEL))[0],)
-            + EXTRA_PLATS
-            + extra_extra
-            + ("whl",)
-        )
-        extra_big_exp = EXTRA_EXPS + [
-            ("Tag", "{pyver}-{abi}-" + plat) for plat in extra_extra
-        ]
-        script_runner.run(
-            [
-                "delocate-addplat",
-                PLAT_WHEEL,
-                "-w",
-                tmpdir,
-                "-x",
-                "10_12",
-                "-d",
-                "universal2",
-                *plat_args,
-            ],
-            check=True,
-        )
-        assert_winfo_similar(out_big_fname, extra_big_exp)
-        # Default is to write into directory of wheel
-        os.mkdir("wheels")
-        shutil.copy2(PLAT_WHEEL, "wheels")
-        local_plat = pjoin("wheels", basename(PLAT_WHEEL))
-        local_out = pjoin("wheels", out_fname)
-        script_runner.run(
-            ["delocate-addplat", local_plat, *plat_args], check=True
-        )
-        assert exists(local_out)
-        # With rm_orig flag, delete original unmodified wheel
-        os.unlink(local_out)
-        script_runner.run(
-            ["delocate-addplat", "-r", local_plat, *plat_args], check=True
-        )
-        assert not exists(local_plat)
-        assert exists(local_out)
-        # Copy original back again
-        shutil.copy2(PLAT_WHEEL, "wheels")
-        # If platforms already present, don't write more
-        res = sorted(os.listdir("wheels"))
-        assert_winfo_similar(local_out, EXTRA_EXPS)
-        script_runner.run(
-            ["delocate-addplat", local_out, "--clobber", *plat_args], check=True
-        )
-        assert sorted(os.listdir("wheels")) == res
-        assert_winfo_similar(local_out, EXTRA_EXPS)
-        # The wheel doesn't get deleted output name same as input, as here
+    assert not exists(out_fname)
+    # Error raised (as above) unless ``--skip-error`` flag set
+    script_runner.run(
+        ["delocate-addplat", PURE_WHEEL, "-w", tmpdir, "-k", *plat_args],
+        check=True,
+    )
+    # Still doesn't do anything though
+    assert not exists(out_fname)
+    # Works for plat_wheel
+    out_fname = ".".join(
+        (splitext(basename(PLAT_WHEEL))[0],) + EXTRA_PLATS + ("whl",)
+    )
+    script_runner.run(
+        ["delocate-addplat", PLAT_WHEEL, "-w", tmpdir, *plat_args],
+        check=True,
+    )
+    assert Path(out_fname).is_file()
+    assert_winfo_similar(out_fname, EXTRA_EXPS)
+    # If wheel exists (as it does) then fail
+    with pytest.raises(subprocess.CalledProcessError):
         script_runner.run(
-            ["delocate-addplat", local_out, "-r", "--clobber", *plat_args],
+            ["delocate-addplat", PLAT_WHEEL, "-w", tmpdir, *plat_args],
             check=True,
         )
-        assert sorted(os.listdir("wheels")) == res
-        # But adds WHEEL tags if missing, even if file name is OK
-        shutil.copy2(local_plat, local_out)
-        with pytest.raises(AssertionError):
-            assert_winfo_similar(local_out, EXTRA_EXPS)
-        script_runner.run(
-            ["delocate-addplat", local_out, "--clobber", *plat_args], check=True
-        )
-        assert sorted(os.listdir("wheels")) == res
-        assert_winfo_similar(local_out, EXTRA_EXPS)
+    # Unless clobber is set
+    script_runner.run(
+        ["delocate-addplat", PLAT_WHEEL, "-c", "-w", tmpdir, *plat_args],
+        check=True,
+    )
+    # Can also specify platform tags via --osx-ver flags
+    script_runner.run(
+        ["delocate-addplat", PLAT_WHEEL, "-c", "-w", tmpdir, "-x", "10_9"],
+        check=True,
+    )
+    assert_winfo_similar(out_fname, EXTRA_EXPS)
+    # Can mix plat_tag and osx_ver
+    extra_extra = ("macosx_10_12_universal2", "macosx_10_12_x86_64")
+    out_big_fname = ".".join(
+        (splitext(basename(PLAT_WHEEL))[0],)
+        + EXTRA_PLATS
+        + extra_extra
+        + ("whl",)
+    )
+    extra_big_exp = EXTRA_EXPS + [
+        ("Tag", "{pyver}-{abi}-" + plat) for plat in extra_extra
+    ]
+    script_runner.run(
+        [
+            "delocate-addplat",
+            PLAT_WHEEL,
+            "-w",
+            tmpdir,
+            "-x",
+            "10_12",
+            "-d",
+            "universal2",
+            *plat_args,
+        ],
+        check=True,
+    )
+    assert_winfo_similar(out_big_fname, extra_big_exp)
+    # Default is to write into directory of wheel
+    os.mkdir("wheels")
+    shutil.copy2(PLAT_WHEEL, "wheels")
+    local_plat = pjoin("wheels", basename(PLAT_WHEEL))
+    local_out = pjoin("wheels", out_fname)
+    script_runner.run(["delocate-addplat", local_plat, *plat_args], check=True)
+    assert exists(local_out)
+    # With rm_orig flag, delete original unmodified wheel
+    os.unlink(local_out)
+    script_runner.run(
+        ["delocate-addplat", "-r", local_plat, *plat_args], check=True
+    )
+    assert not exists(local_plat)
+    assert exists(local_out)
+    # Copy original back again
+    shutil.copy2(PLAT_WHEEL, "wheels")
+    # If platforms already present, don't write more
+    res = sorted(os.listdir("wheels"))
+    assert_winfo_similar(local_out, EXTRA_EXPS)
+    script_runner.run(
+        ["delocate-addplat", local_out, "--clobber", *plat_args], check=True
+    )
+    assert sorted(os.listdir("wheels")) == res
+    assert_winfo_similar(local_out, EXTRA_EXPS)
+    # The wheel doesn't get deleted output name same as input, as here
+    script_runner.run(
+        ["delocate-addplat", local_out, "-r", "--clobber", *plat_args],
+        check=True,
+    )
+    assert sorted(os.listdir("wheels")) == res
+    # But adds WHEEL tags if missing, even if file name is OK
+    shutil.copy2(local_plat, local_out)
+    with pytest.raises(AssertionError):
         assert_winfo_similar(local_out, EXTRA_EXPS)
+    script_runner.run(
+        ["delocate-addplat", local_out, "--clobber", *plat_args], check=True
+    )
+    assert sorted(os.listdir("wheels")) == res
+    assert_winfo_similar(local_out, EXTRA_EXPS)
+    assert_winfo_similar(local_out, EXTRA_EXPS)
 
 
 @pytest.mark.xfail(sys.platform != "darwin", reason="Needs macOS linkage.")
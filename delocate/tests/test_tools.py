@@ -7,11 +7,13 @@ import subprocess
 import sys
 from os.path import dirname
 from os.path import join as pjoin
+from pathlib import Path
 
 import pytest
 
 from ..tmpdirs import InTemporaryDirectory
 from ..tools import (
+    _cache_by_file_stat,
     _is_macho_file,
     add_rpath,
     back_tick,
@@ -22,6 +24,7 @@ from ..tools import (
     ensure_writable,
     find_package_dirs,
     get_archs,
+    invalidate_file_cache,
     lipo_fuse,
     parse_install_name,
     replace_signature,
@@ -339,3 +342,84 @@ def test_is_macho_file() -> None:
         if not os.path.isfile(path):
             continue
         assert_equal(_is_macho_file(path), filename in MACHO_FILES)
+
+
+def test_cache_by_file_stat() -> None:
+    # Results are reused until the file changes or is invalidated
+    calls: list[str] = []
+
+    @_cache_by_file_stat
+    def read_file(fname: str) -> str:
+        calls.append(fname)
+        with open(fname) as fobj:
+            return fobj.read()
+
+    with InTemporaryDirectory():
+        _write_file("afile", "Some text")
+        assert read_file("afile") == "Some text"
+        assert read_file("afile") == "Some text"
+        assert read_file(pjoin(".", "afile")) == "Some text"
+        assert len(calls) == 1
+        _write_file("afile", "Some more text")
+        assert read_file("afile") == "Some more text"
+        assert len(calls) == 2
+        invalidate_file_cache("afile")
+        assert read_file("afile") == "Some more text"
+        assert len(calls) == 3
+        # Missing files are not cached
+        with pytest.raises(FileNotFoundError):
+            read_file("not_a_file")
+        with pytest.raises(FileNotFoundError):
+            read_file("not_a_file")
+        assert len(calls) == 5
+
+
+def test_cache_by_file_stat_args() -> None:
+    # Further arguments are part of the cache key
+    calls: list[tuple[str, int]] = []
+
+    @_cache_by_file_stat
+    def read_part(fname: str, size: int) -> str:
+        calls.append((fname, size))
+        with open(fname) as fobj:
+            return fobj.read(size)
+
+    with InTemporaryDirectory():
+        _write_file("afile", "Some text")
+        assert read_part("afile", 4) == "Some"
+        assert read_part("afile", 9) == "Some text"
+        assert read_part("afile", 4) == "Some"
+        assert read_part("afile", 9) == "Some text"
+        assert len(calls) == 2
+        # A changed file drops the results for all arguments
+        _write_file("afile", "Other text")
+        assert read_part("afile", 4) == "Othe"
+        assert read_part("afile", 9) == "Other tex"
+        assert len(calls) == 4
+        # Keyword arguments are part of the key too
+        assert read_part("afile", size=4) == "Othe"
+        assert read_part("afile", size=4) == "Othe"
+        assert len(calls) == 5
+
+
+def test_cache_by_file_stat_chmod(tmp_path: Path) -> None:
+    # A permission change drops cached results, without changing the contents
+    calls: list[str] = []
+
+    @_cache_by_file_stat
+    def can_read(fname: str) -> bool:
+        calls.append(fname)
+        return os.access(fname, os.R_OK)
+
+    fname = str(tmp_path / "afile")
+    _write_file(fname, "Some text")
+    os.chmod(fname, 0o644)
+    assert can_read(fname)
+    assert can_read(fname)
+    assert len(calls) == 1
+    os.chmod(fname, 0o600)
+    can_read(fname)
+    assert len(calls) == 2
+    os.chmod(fname, 0)
+    can_read(fname)
+    assert len(calls) == 3
@@ -2,29 +2,48 @@
 
 from __future__ import annotations
 
+import functools
 import itertools
 import logging
 import os
 import re
 import stat
+import struct
 import subprocess
+import sys
 import time
 import warnings
 import zipfile
-from collections.abc import Iterable, Iterator, Sequence
+from collections.abc import Container, Iterable, Iterator, Sequence
 from datetime import datetime
 from os import PathLike
-from os.path import exists, isdir
+from os.path import exists, isdir, realpath
 from os.path import join as pjoin
 from pathlib import Path
 from typing import (
     Any,
+    Callable,
     TypeVar,
+    cast,
 )
 
+from macholib.mach_o import (  # type: ignore[import-untyped]
+    CPU_TYPE_NAMES,
+    LC_ID_DYLIB,
+    LC_LAZY_LOAD_DYLIB,
+    LC_LOAD_DYLIB,
+    LC_LOAD_UPWARD_DYLIB,
+    LC_LOAD_WEAK_DYLIB,
+    LC_REEXPORT_DYLIB,
+    LC_RPATH,
+    get_cpu_subtype,
+)
+from macholib.MachO import MachO, MachOHeader  # type: ignore[import-untyped]
+from macholib.ptypes import sizeof  # type: ignore[import-untyped]
 from typing_extensions import deprecated
 
 T = TypeVar("T")
+F = TypeVar("F", bound=Callable[..., Any])
 
 logger = logging.getLogger(__name__)
 
@@ -177,6 +196,85 @@ def _is_macho_file(filename: str | os.PathLike[str]) -> bool:
         return False
 
 
+_FILE_CACHE_MAXSIZE = 4096
+"""Maximum number of files to remember in each per-file result cache."""
+
+_FileStamp = tuple[int, int, int, int, int]
+_FileResults = dict[tuple[Any, ...], Any]
+_file_caches: list[dict[str, tuple[_FileStamp, _FileResults]]] = []
+
+
+def _cache_by_file_stat(func: F) -> F:
+    """Cache results of `func`, a function of a filename.
+
+    Results are keyed on the real path of the file and on any further
+    arguments, which must be hashable.  A cached result is reused only while
+    the inode, size, mode, modification time and status change time of the
+    file are unchanged, so a file modified or re-permissioned on disk is
+    inspected again.  Files that cannot be stat-ed are passed straight to
+    `func`.
+
+    Use :func:`invalidate_file_cache` to discard results for a file after
+    modifying it.
+    """
+    cache: dict[str, tuple[_FileStamp, _FileResults]] = {}
+    _file_caches.append(cache)
+
+    @functools.wraps(func)
+    def wrapper(
+        filename: str | PathLike[str], *args: Any, **kwargs: Any
+    ) -> Any:
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return func(filename, *args, **kwargs)
+        path = realpath(filename)
+        stamp = (
+            st.st_ino,
+            st.st_size,
+            st.st_mode,
+            st.st_mtime_ns,
+            st.st_ctime_ns,
+        )
+        key = (args, tuple(sorted(kwargs.items())))
+        results: _FileResults
+        cached = cache.get(path)
+        if cached is not None and cached[0] == stamp:
+            results = cached[1]
+            if key in results:
+                return results[key]
+        else:
+            results = {}
+            cache.pop(path, None)
+            if len(cache) >= _FILE_CACHE_MAXSIZE:
+                del cache[next(iter(cache))]  # Drop the oldest entry
+            cache[path] = (stamp, results)
+        result = results[key] = func(filename, *args, **kwargs)
+        return result
+
+    return cast(F, wrapper)
+
+
+def invalidate_file_cache(filename: str | PathLike[str]) -> None:
+    """Discard all cached results for `filename`.
+
+    This clears every per-file cache, including parsed load commands,
+    ``otool`` output, install names, architectures and minimum macOS versions.
+
+    Delocate calls this after modifying a library.  Call it yourself if you
+    modify a library by other means and the modification might not show in
+    the file's inode, size, mode or timestamps.
+
+    Parameters
+    ----------
+    filename : str or PathLike
+        filename of library
+    """
+    path = realpath(filename)
+    for cache in _file_caches:
+        cache.pop(path, None)
+
+
 def _unique_everseen(iterable: Iterable[T], /) -> Iterator[T]:
     """Yield unique elements, preserving order.
 
@@ -540,6 +638,110 @@ def _line0_says_object(
     )
 
 
+_LC_DYLIB_COMMANDS = frozenset(
+    [
+        LC_ID_DYLIB,
+        LC_LOAD_DYLIB,
+        LC_LOAD_WEAK_DYLIB,
+        LC_REEXPORT_DYLIB,
+        LC_LAZY_LOAD_DYLIB,
+        LC_LOAD_UPWARD_DYLIB,
+    ]
+)
+"""Load commands listed by ``otool -L``."""
+
+
+def _otool_arch_name(header: MachOHeader) -> str | None:
+    """Return the ``otool -arch all`` name for the architecture of `header`.
+
+    None for architecture subtypes, such as arm64e, which ``otool`` names
+    differently from the CPU type.
+    """
+    cputype = header.header.cputype
+    subtype = get_cpu_subtype(cputype, header.header.cpusubtype)
+    if not str(subtype).endswith("_ALL") or cputype not in CPU_TYPE_NAMES:
+        return None
+    return str(CPU_TYPE_NAMES[cputype]).lower()
+
+
+@_cache_by_file_stat
+def _read_load_commands(
+    filename: str | PathLike[str],
+) -> dict[str, tuple[tuple[int, str], ...]] | None:
+    """Return dylib and rpath load commands read directly from `filename`.
+
+    Reading the Mach-O headers in-process with ``macholib`` avoids running
+    ``otool`` for the common cases.
+
+    Parameters
+    ----------
+    filename : str or PathLike
+        filename of library
+
+    Returns
+    -------
+    commands : dict or None
+        The key is the architecture as named by ``otool -arch all``, which is
+        '' for a thin file.  The value is the command number and path string
+        of each dylib and rpath load command, in file order.  None if the file
+        cannot be read or has an architecture this reader cannot name, in
+        which case use ``otool``.
+    """
+    try:
+        macho = MachO(os.fspath(filename))
+        out: dict[str, tuple[tuple[int, str], ...]] = {}
+        for header in macho.headers:
+            arch = "" if macho.fat is None else _otool_arch_name(header)
+            if arch is None or arch in out:
+                return None
+            commands = []
+            for load_cmd, cmd, data in header.commands:
+                if load_cmd.cmd == LC_RPATH:
+                    name_offset = cmd.path
+                elif load_cmd.cmd in _LC_DYLIB_COMMANDS:
+                    name_offset = cmd.name
+                else:
+                    continue
+                # The path offset counts from the start of the load command.
+                start = name_offset - sizeof(load_cmd) - sizeof(cmd)
+                name = data[start:].split(b"\0", 1)[0].decode()
+                commands.append((load_cmd.cmd, name))
+            out[arch] = tuple(commands)
+        return out
+    except (OSError, ValueError, struct.error):
+        # UnicodeDecodeError is a ValueError.
+        return None
+
+
+def _read_load_command_listing(
+    filename: str | PathLike[str], commands: Container[int]
+) -> dict[str, list[str]] | None:
+    """Return paths of `commands` in `filename` per architecture.
+
+    The result matches parsing the matching ``otool`` listing, or is None
+    where :func:`_read_load_commands` cannot read the file.
+    """
+    found = _read_load_commands(filename)
+    if found is None:
+        return None
+    return {
+        arch: [name for cmd, name in arch_commands if cmd in commands]
+        for arch, arch_commands in found.items()
+    }
+
+
+@_cache_by_file_stat
+def _run_otool(
+    filename: str | PathLike[str], flag: str
+) -> subprocess.CompletedProcess[str]:
+    """Return the result of ``otool -arch all`` with `flag` on `filename`.
+
+    The result is reused until `filename` changes on disk, so that install
+    names, install ids and rpaths are read once per library version.
+    """
+    return _run(["otool", "-arch", "all", flag, filename], check=False)
+
+
 def _get_install_names(
     filename: str | PathLike[str],
 ) -> dict[str, list[str]]:
@@ -566,14 +768,23 @@ def _get_install_names(
     """
     if not _is_macho_file(filename):
         return {}
-    otool = _run(["otool", "-arch", "all", "-L", filename], check=False)
-    if not _line0_says_object(otool.stdout or otool.stderr, filename):
-        return {}
+    names_by_arch = _read_load_command_listing(filename, _LC_DYLIB_COMMANDS)
+    if names_by_arch is None:
+        otool = _run_otool(filename, "-L")
+        if not _line0_says_object(otool.stdout or otool.stderr, filename):
+            return {}
+        names_by_arch = {
+            arch: [name for name, _, _ in names_data]
+            for arch, names_data in _parse_otool_install_names(
+                otool.stdout
+            ).items()
+        }
     install_ids = _get_install_ids(filename)
     # Collect install names for each architecture
     all_names: dict[str, list[str]] = {}
-    for arch, names_data in _parse_otool_install_names(otool.stdout).items():
-        names = [name for name, _, _ in names_data]
+    for arch, arch_names in names_by_arch.items():
+        # Interned, as the same system libraries recur across a tree.
+        names = [sys.intern(name) for name in arch_names]
         # Remove redundant install id from the install names.
         if arch in install_ids:
             if names[0] != install_ids[arch]:
@@ -586,6 +797,7 @@ def _get_install_names(
     return all_names
 
 
+@_cache_by_file_stat
 def get_install_names(filename: str | PathLike[str]) -> tuple[str, ...]:
     """Return install names from library named in `filename`.
 
@@ -669,11 +881,14 @@ def _get_install_ids(filename: str | PathLike[str]) -> dict[str, str]:
     """
     if not _is_macho_file(filename):
         return {}
-    otool = _run(["otool", "-arch", "all", "-D", filename], check=False)
-    if not _line0_says_object(otool.stdout or otool.stderr, filename):
-        return {}
+    ids_by_arch = _read_load_command_listing(filename, (LC_ID_DYLIB,))
+    if ids_by_arch is None:
+        otool = _run_otool(filename, "-D")
+        if not _line0_says_object(otool.stdout or otool.stderr, filename):
+            return {}
+        ids_by_arch = _parse_otool_listing(otool.stdout)
     out = {}
-    for arch, my_id_list in _parse_otool_listing(otool.stdout).items():
+    for arch, my_id_list in ids_by_arch.items():
         if not my_id_list:
             continue  # No install ID.
         if len(my_id_list) != 1:
@@ -708,12 +923,53 @@ def set_install_name(
     _run(
         ["install_name_tool", "-change", oldname, newname, filename], check=True
     )
+    invalidate_file_cache(filename)
     if ad_hoc_sign:
         # ad hoc signature is represented by a dash
         # https://developer.apple.com/documentation/security/seccodesignatureflags/kseccodesignatureadhoc
         replace_signature(filename, "-")
 
 
+@ensure_writable
+def set_install_names(
+    filename: str,
+    changes: Iterable[tuple[str, str]],
+    ad_hoc_sign: bool = True,
+) -> None:
+    """Apply several install name changes to `filename` in one command.
+
+    Parameters
+    ----------
+    filename : str
+        filename of library
+    changes : iterable of (str, str)
+        ``(oldname, newname)`` pairs, where ``oldname`` is a current install
+        name in the library and ``newname`` is its replacement.
+    ad_hoc_sign : {True, False}, optional
+        If True, sign library with ad-hoc signature
+
+    Raises
+    ------
+    InstallNameError
+        If any ``oldname`` is not an install name of `filename`.
+    """
+    changes = list(changes)
+    if not changes:
+        return
+    names = get_install_names(filename)
+    cmd = ["install_name_tool"]
+    for oldname, newname in changes:
+        if oldname not in names:
+            raise InstallNameError(
+                f"{oldname} not in install names for {filename}"
+            )
+        cmd += ["-change", oldname, newname]
+    _run([*cmd, filename], check=True)
+    invalidate_file_cache(filename)
+    if ad_hoc_sign:
+        replace_signature(filename, "-")
+
+
 @ensure_writable
 def set_install_id(
     filename: str | PathLike[str], install_id: str, ad_hoc_sign: bool = True
@@ -736,6 +992,7 @@ def set_install_id(
     if not _get_install_ids(filename):
         raise InstallNameError(f"{filename} has no install id")
     _run(["install_name_tool", "-id", install_id, filename], check=True)
+    invalidate_file_cache(filename)
     if ad_hoc_sign:
         replace_signature(filename, "-")
 
@@ -828,7 +1085,10 @@ def _get_rpaths(
     """
     if not _is_macho_file(filename):
         return {}
-    otool = _run(["otool", "-arch", "all", "-l", filename], check=False)
+    rpaths = _read_load_command_listing(filename, (LC_RPATH,))
+    if rpaths is not None:
+        return rpaths
+    otool = _run_otool(filename, "-l")
     if not _line0_says_object(otool.stdout or otool.stderr, filename):
         return {}
 
@@ -904,6 +1164,7 @@ def add_rpath(filename: str, newpath: str, ad_hoc_sign: bool = True) -> None:
         If True, sign file with ad-hoc signature
     """
     _run(["install_name_tool", "-add_rpath", newpath, filename], check=True)
+    invalidate_file_cache(filename)
     if ad_hoc_sign:
         replace_signature(filename, "-")
 
@@ -932,6 +1193,7 @@ def _delete_rpaths(
             ["install_name_tool", "-delete_rpath", rpath, filename],
             check=True,
         )
+        invalidate_file_cache(filename)
     if ad_hoc_sign:
         replace_signature(filename, "-")
 
@@ -987,6 +1249,10 @@ def _remove_absolute_rpaths(filename: str, ad_hoc_sign: bool = True) -> None:
     )
 
 
+_ZIP_BUFFER_SIZE = 1 << 20
+"""Buffer size in bytes for reading and writing zip archives."""
+
+
 def zip2dir(
     zip_fname: str | PathLike[str], out_dir: str | PathLike[str]
 ) -> None:
@@ -1003,19 +1269,19 @@ def zip2dir(
     # http://bugs.python.org/issue15795
     # external_attr is not well documented but you can learn about it here
     # https://unix.stackexchange.com/questions/14705/the-zip-formats-external-file-attribute
-    with zipfile.ZipFile(zip_fname, "r") as zip:
-        for name in zip.namelist():
-            member = zip.getinfo(name)
-            extracted_path = zip.extract(member, out_dir)
-            unix_attrs = member.external_attr >> 16
-            if member.is_dir():
-                os.chmod(extracted_path, 0o755)
-            elif unix_attrs != 0:
-                permissions = unix_attrs & 0o777
-                os.chmod(extracted_path, permissions)
-            # Restore timestamp
-            modified_time = datetime(*member.date_time).timestamp()
-            os.utime(extracted_path, (modified_time, modified_time))
+    with open(zip_fname, "rb", buffering=_ZIP_BUFFER_SIZE) as zip_file:
+        with zipfile.ZipFile(zip_file, "r") as zip:
+            for member in zip.infolist():
+                extracted_path = zip.extract(member, out_dir)
+                unix_attrs = member.external_attr >> 16
+                if member.is_dir():
+                    os.chmod(extracted_path, 0o755)
+                elif unix_attrs != 0:
+                    permissions = unix_attrs & 0o777
+                    os.chmod(extracted_path, permissions)
+                # Restore timestamp
+                modified_time = datetime(*member.date_time).timestamp()
+                os.utime(extracted_path, (modified_time, modified_time))
 
 
 _ZIP_TIMESTAMP_MIN = 315532800  # 1980-01-01 00:00:00 UTC
@@ -1075,29 +1341,35 @@ def dir2zip(
         Datetime tuple ``(Y, m, d, H, M, S)`` for all recorded entries.
     """
     date_time = _get_zip_datetime(date_time)
-    with zipfile.ZipFile(
-        zip_fname, "w", compression=compression, compresslevel=compress_level
-    ) as zip:
-        for root, dirs, files in os.walk(in_dir):
-            for dir in dirs:
-                dir_path = Path(root, dir)
-                out_dir_name = str(dir_path.relative_to(in_dir)) + "/"
-                zip_info = zipfile.ZipInfo.from_file(dir_path, out_dir_name)
-                if date_time is not None:
-                    zip_info.date_time = date_time
-                zip.writestr(zip_info, b"")
-            for file in files:
-                file_path = Path(root, file)
-                out_file_path = file_path.relative_to(in_dir)
-                zip_info = zipfile.ZipInfo.from_file(file_path, out_file_path)
-                if date_time is not None:
-                    zip_info.date_time = date_time
-                zip.writestr(
-                    zip_info,
-                    file_path.read_bytes(),
-                    compress_type=compression,
-                    compresslevel=compress_level,
-                )
+    with open(zip_fname, "wb", buffering=_ZIP_BUFFER_SIZE) as zip_file:
+        with zipfile.ZipFile(
+            zip_file,
+            "w",
+            compression=compression,
+            compresslevel=compress_level,
+        ) as zip:
+            for root, dirs, files in os.walk(in_dir):
+                for dir in dirs:
+                    dir_path = Path(root, dir)
+                    out_dir_name = str(dir_path.relative_to(in_dir)) + "/"
+                    zip_info = zipfile.ZipInfo.from_file(dir_path, out_dir_name)
+                    if date_time is not None:
+                        zip_info.date_time = date_time
+                    zip.writestr(zip_info, b"")
+                for file in files:
+                    file_path = Path(root, file)
+                    out_file_path = file_path.relative_to(in_dir)
+                    zip_info = zipfile.ZipInfo.from_file(
+                        file_path, out_file_path
+                    )
+                    if date_time is not None:
+                        zip_info.date_time = date_time
+                    zip.writestr(
+                        zip_info,
+                        file_path.read_bytes(),
+                        compress_type=compression,
+                        compresslevel=compress_level,
+                    )
 
 
 def find_package_dirs(root_path: str) -> set[str]:
@@ -1145,6 +1417,7 @@ def cmp_contents(filename1, filename2):
     return contents1 == contents2
 
 
+@_cache_by_file_stat
 def get_archs(libname: str) -> frozenset[str]:
     """Return architecture types from library `libname`.
 
@@ -1173,13 +1446,12 @@ def get_archs(libname: str) -> frozenset[str]:
     else:
         assert len(lines) == 1
         line = lines[0]
-    for reggie in (
-        f"Non-fat file: {re.escape(libname)} is architecture: (.*)",
-        f"Architectures in the fat file: {re.escape(libname)} are: (.*)",
+    for start in (
+        f"Non-fat file: {libname} is architecture: ",
+        f"Architectures in the fat file: {libname} are: ",
     ):
-        match = re.match(reggie, line)
-        if match is not None:
-            return frozenset(match.groups()[0].split(" "))
+        if line.startswith(start):
+            return frozenset(line[len(start) :].split(" "))
     raise ValueError(f"Unexpected output: '{stdout}' for {libname}")
 
 
@@ -1208,6 +1480,7 @@ def lipo_fuse(
         ["lipo", "-create", in_fname1, in_fname2, "-output", out_fname],
         check=True,
     )
+    invalidate_file_cache(out_fname)
     if ad_hoc_sign:
         replace_signature(out_fname, "-")
     return lipo.stdout.strip()
@@ -1227,6 +1500,7 @@ def replace_signature(filename: str | PathLike[str], identity: str) -> None:
         The signing identity to use.
     """
     _run(["codesign", "--force", "--sign", identity, filename], check=True)
+    invalidate_file_cache(filename)
 
 
 def validate_signature(filename: str) -> None: